@@ -0,0 +1,127 @@
+# anthropometry.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from enum import IntEnum
+
+import cv2
+import numpy as np
+
+from pose_pool import acquire_pose
+from tracing import stage
+
+
+class PL(IntEnum):
+    # BlazePose indices, as in mediapipe's PoseLandmark; kept here so importing this module doesn't load mediapipe
+    NOSE = 0
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+
+
+LANDMARK_CACHE_SIZE = 64
+# Pose runs on a proxy no larger than this; 0 disables downscaling
+INFERENCE_MAX_SIDE = int(os.getenv("POSE_MAX_SIDE", 1280))
+# Also run full-res inference and report how far the proxy landmarks drift
+ACCURACY_CHECK = os.getenv("POSE_ACCURACY_CHECK", "0") == "1"
+
+
+class PoseLandmarks:
+    # Normalised (x, y, z, visibility) for all 33 pose landmarks plus the pixel size they map onto
+    __slots__ = ("coords", "width", "height")
+
+    def __init__(self, coords, width, height):
+        self.coords = coords
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_results(cls, results, width, height):
+        landmarks = results.pose_landmarks.landmark
+        coords = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+        return cls(coords, width, height)
+
+    def point(self, landmark):
+        x, y = self.coords[int(landmark), :2]
+        return int(x * self.width), int(y * self.height)
+
+    def visibility(self, landmark):
+        return float(self.coords[int(landmark), 3])
+
+    def height_points(self):
+        head_y = self.point(PL.NOSE)[1]
+        foot_y = max(self.point(PL.LEFT_ANKLE)[1], self.point(PL.RIGHT_ANKLE)[1])
+        return head_y, foot_y
+
+    def arm_points(self):
+        return (
+            self.point(PL.LEFT_SHOULDER),
+            self.point(PL.LEFT_ELBOW),
+            self.point(PL.RIGHT_SHOULDER),
+            self.point(PL.RIGHT_ELBOW),
+        )
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def image_digest(image):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(image.shape).encode())
+    h.update(np.ascontiguousarray(image).data)
+    return h.hexdigest()
+
+
+def fit_within(image, max_side):
+    h, w = image.shape[:2]
+    if not max_side or max(h, w) <= max_side:
+        return image, 1.0
+    scale = max_side / max(h, w)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def _run_pose(image_rgb, max_side):
+    h, w = image_rgb.shape[:2]
+    with stage("pose.resize"):
+        proxy, _ = fit_within(image_rgb, max_side)
+    with acquire_pose() as pose, stage("pose.process"):
+        results = pose.process(proxy)
+    if not results.pose_landmarks:
+        return None
+    # Landmarks are normalised, so sizing the record to the original maps them back to full-res pixels
+    return PoseLandmarks.from_results(results, w, h)
+
+
+def landmark_delta(a, b):
+    # Largest pixel shift of any landmark between two records of the same image
+    if a is None or b is None:
+        return None
+    dx = (a.coords[:, 0] - b.coords[:, 0]) * a.width
+    dy = (a.coords[:, 1] - b.coords[:, 1]) * a.height
+    return float(np.hypot(dx, dy).max())
+
+
+def extract_landmarks(image_bgr, digest=None, rgb=None, max_side=None):
+    # One pose pass per distinct image; both height and MUAC read from the same record
+    if max_side is None:
+        max_side = INFERENCE_MAX_SIDE
+    key = (digest or image_digest(image_bgr), max_side)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    if rgb is None:
+        rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    record = _run_pose(rgb, max_side)
+    with _cache_lock:
+        _cache[key] = record
+        _cache.move_to_end(key)
+        while len(_cache) > LANDMARK_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return record
@@ -0,0 +1,42 @@
+# app_state.py
+# Session state for the multipage app. Each tool keeps its values in its own namespace, so tools
+# can't clobber each other's clicks or widgets. Photo measurements are handed to the nutrition entry
+# form through one shared dict instead of being re-uploaded and re-inferred there.
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+MEASUREMENTS_KEY = "measured"
+
+
+def tool_state(namespace, **defaults):
+    # Mutable dict that lives in st.session_state for the whole session
+    state = st.session_state.setdefault(f"tool:{namespace}", {})
+    for name, value in defaults.items():
+        state.setdefault(name, value)
+    return state
+
+
+def widget_key(namespace, name):
+    return f"{namespace}:{name}"
+
+
+def rerun_fragment():
+    # Streamlit only allows scope="fragment" during a fragment rerun; the first pass of a fragment
+    # runs as part of the full script, so fall back to a full rerun there
+    ctx = get_script_run_ctx()
+    if ctx is not None and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
+
+
+def share_measurement(field, value):
+    # field is a nutrition_data column: "height" or "arm"
+    st.session_state.setdefault(MEASUREMENTS_KEY, {})[field] = value
+
+
+def shared_measurements():
+    return dict(st.session_state.get(MEASUREMENTS_KEY, {}))
+
+
+def clear_measurements():
+    st.session_state.pop(MEASUREMENTS_KEY, None)
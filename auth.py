@@ -0,0 +1,168 @@
+# auth.py
+# Password hashing and signed session tokens.
+# Passwords are stored as salted scrypt hashes ("scrypt$n$r$p$salt$hash"). Accounts still holding a
+# plaintext password are upgraded the first time they log in, or all at once with
+#   python auth.py migrate [--users-json users.json]
+# which also imports the accounts from the old users.json file.
+# After a successful login the session holds an HMAC-signed token with an expiry, so later reruns
+# check the signature locally instead of querying users again.
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import time
+
+import streamlit as st
+
+from data_access import get_data_access
+
+# Without AUTH_SECRET each process signs with its own random key, so sessions end on restart
+AUTH_SECRET = os.getenv("AUTH_SECRET", "").encode() or secrets.token_bytes(32)
+SESSION_TTL = int(os.getenv("SESSION_TTL", 8 * 3600))
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+SESSION_KEY = "auth_token"
+# Usernames that may view every worker's records on the dashboard, comma-separated
+SUPERVISORS = frozenset(u.strip() for u in os.getenv("SUPERVISORS", "").split(",") if u.strip())
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith("scrypt$")
+
+
+def verify_password(password, stored):
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        # Legacy plaintext row; the caller rehashes it on success
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = _unb64(digest)
+        actual = hashlib.scrypt(password.encode(), salt=_unb64(salt), n=int(n), r=int(r), p=int(p),
+                                dklen=len(expected))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored):
+    if not is_hashed(stored):
+        return True
+    _, n, r, p, _, _ = stored.split("$")
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def authenticate(username, password, data=None):
+    # One users read per login attempt; plaintext or outdated hashes are replaced on success
+    data = data or get_data_access()
+    stored = data.password_hash(username)
+    if not verify_password(password, stored):
+        return False
+    if needs_rehash(stored):
+        data.set_password_hash(username, hash_password(password))
+    return True
+
+
+def register(username, email, password, data=None):
+    # False if the username is already taken
+    data = data or get_data_access()
+    return data.create_user(username, email, hash_password(password))
+
+
+def issue_token(username, ttl=SESSION_TTL, now=None):
+    expires = int((now or time.time()) + ttl)
+    payload = _b64(json.dumps({"u": username, "exp": expires}, separators=(",", ":")).encode())
+    signature = _b64(hmac.new(AUTH_SECRET, payload.encode(), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+
+def verify_token(token, now=None):
+    # Username for a valid, unexpired token; None otherwise
+    if not token or "." not in token:
+        return None
+    payload, signature = token.rsplit(".", 1)
+    expected = _b64(hmac.new(AUTH_SECRET, payload.encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(signature, expected):
+        return None
+    try:
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) < (now or time.time()):
+        return None
+    return claims.get("u")
+
+
+# -- Streamlit session --
+
+def current_user():
+    username = verify_token(st.session_state.get(SESSION_KEY))
+    if username is None:
+        st.session_state.pop(SESSION_KEY, None)
+    return username
+
+
+def is_supervisor(username):
+    return username in SUPERVISORS
+
+
+def start_session(username):
+    st.session_state[SESSION_KEY] = issue_token(username)
+
+
+def end_session():
+    st.session_state.pop(SESSION_KEY, None)
+
+
+# -- migration --
+
+def migrate(users_json=None, data=None):
+    # Hash every plaintext password in users and import accounts from users.json (hashed).
+    # Returns {"rehashed": n, "imported": n}
+    data = data or get_data_access()
+    result = {"rehashed": 0, "imported": 0}
+    for row in data.users_with_passwords():
+        if is_hashed(row["password"]):
+            continue
+        data.set_password_hash(row["username"], hash_password(row["password"]))
+        result["rehashed"] += 1
+    if users_json and os.path.exists(users_json):
+        with open(users_json) as f:
+            accounts = json.load(f)
+        for username, account in accounts.items():
+            if register(username, account.get("email"), account["password"], data):
+                result["imported"] += 1
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Account maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("migrate", help="hash plaintext passwords and import users.json accounts")
+    cmd.add_argument("--users-json", help="legacy users.json to import")
+    args = parser.parse_args(argv)
+    result = migrate(args.users_json)
+    print(f"{result['rehashed']} password(s) hashed, {result['imported']} account(s) imported")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# batch_measure.py
+# Headless height/MUAC measurement over a folder or ZIP of images, for screening camps.
+#
+#   python batch_measure.py photos.zip --manifest calibration.csv --out results.csv
+#
+# The manifest is a CSV with columns image, reference_length, x1, y1, x2, y2 and optional weight.
+# `image` is a file name or a glob (e.g. "camA_*" or "*"), so one row can calibrate a whole camera setup.
+# Exact names win over globs; among globs the first matching row wins.
+import argparse
+import csv
+import fnmatch
+import os
+import sys
+import time
+import zipfile
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+# Detectors come straight from anthropometry: the tool modules load streamlit and the app's storage
+from anthropometry import extract_landmarks
+from nutrition import get_status, get_muac_status, compute_bmi
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+RESULT_FIELDS = [
+    "image", "reference_length", "calibration_factor", "height_cm", "muac_cm",
+    "muac_status", "weight", "bmi", "status", "error",
+]
+
+
+class Calibration:
+    __slots__ = ("reference_length", "p1", "p2", "weight")
+
+    def __init__(self, reference_length, p1, p2, weight=None):
+        self.reference_length = reference_length
+        self.p1 = p1
+        self.p2 = p2
+        self.weight = weight
+
+    @property
+    def factor(self):
+        return self.reference_length / get_pixel_distance(self.p1, self.p2)
+
+
+def load_manifest(path):
+    exact, patterns = {}, []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            weight = (row.get("weight") or "").strip()
+            calibration = Calibration(
+                float(row["reference_length"]),
+                (float(row["x1"]), float(row["y1"])),
+                (float(row["x2"]), float(row["y2"])),
+                float(weight) if weight else None,
+            )
+            name = row["image"].strip()
+            if any(c in name for c in "*?["):
+                patterns.append((name, calibration))
+            else:
+                exact[name] = calibration
+    return exact, patterns
+
+
+def match_calibration(manifest, name):
+    exact, patterns = manifest
+    base = os.path.basename(name)
+    for key in (name, base):
+        if key in exact:
+            return exact[key]
+    for pattern, calibration in patterns:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(base, pattern):
+            return calibration
+    return None
+
+
+def list_images(source):
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            names = [n for n in zf.namelist() if n.lower().endswith(IMAGE_EXTENSIONS)]
+    else:
+        names = [
+            os.path.relpath(os.path.join(root, f), source)
+            for root, _, files in os.walk(source)
+            for f in files if f.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    return sorted(names)
+
+
+_zip = None
+
+
+def _read_image(source, name):
+    # Each worker keeps its own handle on the ZIP; ZipFile objects can't be shared across processes
+    global _zip
+    if zipfile.is_zipfile(source):
+        if _zip is None or _zip.filename != source:
+            _zip = zipfile.ZipFile(source)
+        data = _zip.read(name)
+    else:
+        with open(os.path.join(source, name), "rb") as f:
+            data = f.read()
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("could not decode image")
+    return image
+
+
+def measure_image(job):
+    source, name, calibration = job
+    row = dict.fromkeys(RESULT_FIELDS)
+    row["image"] = name
+    try:
+        if calibration is None:
+            raise ValueError("no calibration in manifest")
+        row["reference_length"] = calibration.reference_length
+        factor = calibration.factor
+        row["calibration_factor"] = round(factor, 6)
+        image = _read_image(source, name)
+
+        # One landmark record serves both measurements, so pose runs once per image
+        landmarks = extract_landmarks(image)
+        if landmarks is None:
+            raise ValueError("could not detect landmarks")
+        head_y, foot_y = landmarks.height_points()
+        l_shoulder, l_elbow, r_shoulder, r_elbow = landmarks.arm_points()
+
+        height_cm = factor * abs(foot_y - head_y)
+        row["height_cm"] = round(height_cm, 2)
+        shoulder, elbow = (l_shoulder, l_elbow) if l_shoulder and l_elbow else (r_shoulder, r_elbow)
+        muac_cm = factor * np.linalg.norm(np.subtract(shoulder, elbow))
+        row["muac_cm"] = round(muac_cm, 2)
+        row["muac_status"] = get_muac_status(muac_cm)
+        if calibration.weight:
+            bmi = compute_bmi(calibration.weight, height_cm)
+            row["weight"] = calibration.weight
+            row["bmi"] = round(bmi, 2)
+            row["status"] = get_status(bmi)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+class CsvSink:
+    def __init__(self, path):
+        self._file = open(path, "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    # Rows are buffered into row groups so a crash loses at most one group
+    def __init__(self, path, group_size=256):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow; install it or write to .csv")
+        self._pa = pa
+        self._schema = pa.schema(
+            [(f, pa.string()) if f in ("image", "muac_status", "status", "error") else (f, pa.float64())
+             for f in RESULT_FIELDS]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+        self.group_size = group_size
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_sink(path):
+    if path.lower().endswith(".parquet"):
+        return ParquetSink(path)
+    return CsvSink(path)
+
+
+def print_progress(done, total, row):
+    status = "FAILED " + row["error"] if row["error"] else "ok"
+    print(f"[{done}/{total}] {row['image']}: {status}", file=sys.stderr)
+
+
+def run_batch(source, manifest_path, out_path, workers=None, progress=print_progress):
+    manifest = load_manifest(manifest_path)
+    names = list_images(source)
+    jobs = [(source, name, match_calibration(manifest, name)) for name in names]
+
+    sink = open_sink(out_path)
+    done = failed = 0
+    start = time.perf_counter()
+    try:
+        with Pool(processes=workers or os.cpu_count()) as pool:
+            for row in pool.imap_unordered(measure_image, jobs, chunksize=4):
+                done += 1
+                failed += row["error"] is not None
+                sink.write(row)
+                if progress:
+                    progress(done, len(jobs), row)
+    finally:
+        sink.close()
+    return {"images": done, "failed": failed, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch height/MUAC measurement over a folder or ZIP of images")
+    parser.add_argument("source", help="directory or .zip of images")
+    parser.add_argument("--manifest", required=True, help="calibration CSV")
+    parser.add_argument("--out", default="results.csv", help="output .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--quiet", action="store_true", help="no per-image progress")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.source, args.manifest, args.out, args.workers,
+                        progress=None if args.quiet else print_progress)
+    print(f"Processed {summary['images']} images ({summary['failed']} failed) in {summary['seconds']}s -> {args.out}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# benchmarks/bench_calibration.py
+# Accuracy and latency of automatic reference detection (calibration.detect_reference) against
+# the two-click manual path, on synthetic photos. Each scene gets a textured background and a
+# reference of known pixel length (an ArUco marker or an ID-1 card) at a random scale, rotation and
+# position, plus sensor noise.
+# Manual clicks are simulated as the true endpoints plus Gaussian error in display pixels. Their
+# latency is the per-click cost the app still pays (re-encoding the display canvas for the click
+# component) times two; the user's own time is not counted.
+#
+#   python -m benchmarks.bench_calibration [--scenes 50] [--kind aruco|card] [--click-sigma 2]
+import argparse
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+import calibration
+from anthropometry import fit_within
+from image_cache import DISPLAY_MAX_SIDE
+
+SCENE_SIZE = (3000, 4000)  # h, w: a typical phone photo
+
+
+def _marker(side):
+    dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, calibration.ARUCO_DICT))
+    if hasattr(cv2.aruco, "generateImageMarker"):
+        marker = cv2.aruco.generateImageMarker(dictionary, 7, side)
+    else:
+        marker = cv2.aruco.drawMarker(dictionary, 7, side)
+    # White quiet zone, as on a printed marker
+    border = side // 4
+    return cv2.copyMakeBorder(marker, border, border, border, border, cv2.BORDER_CONSTANT, value=255), border
+
+
+def make_scene(rng, kind):
+    # (rgb image, true reference length in px, true endpoints)
+    h, w = SCENE_SIZE
+    background = rng.integers(60, 200, (h // 16, w // 16, 3), dtype=np.uint8)
+    scene = cv2.resize(background, (w, h), interpolation=cv2.INTER_CUBIC)
+    length = float(rng.uniform(150, 600))
+    angle = float(rng.uniform(-30, 30))
+    cx, cy = rng.uniform(0.25, 0.75) * w, rng.uniform(0.25, 0.75) * h
+
+    if kind == "aruco":
+        side = int(round(length))
+        patch, border = _marker(side)
+        corners = np.float32([[border, border], [border + side, border],
+                              [border + side, border + side], [border, border + side]])
+        mask = np.full(patch.shape, 255, np.uint8)
+        patch = cv2.cvtColor(patch, cv2.COLOR_GRAY2RGB)
+        length = float(side)
+    else:
+        long_side, short_side = int(round(length)), int(round(length / calibration.CARD_ASPECT))
+        patch = np.empty((short_side, long_side, 3), np.uint8)
+        patch[:] = (235, 235, 240)
+        corners = np.float32([[0, 0], [long_side, 0], [long_side, short_side], [0, short_side]])
+        mask = np.full(patch.shape[:2], 255, np.uint8)
+
+    ph, pw = patch.shape[:2]
+    matrix = cv2.getRotationMatrix2D((pw / 2, ph / 2), angle, 1.0)
+    matrix[:, 2] += (cx - pw / 2, cy - ph / 2)
+    warped = cv2.warpAffine(patch, matrix, (w, h))
+    warped_mask = cv2.warpAffine(mask, matrix, (w, h)) > 127
+    scene[warped_mask] = warped[warped_mask]
+    noise = rng.normal(0, 4, scene.shape)
+    scene = np.clip(scene + noise, 0, 255).astype(np.uint8)
+    endpoints = cv2.transform(corners[None, :2], matrix)[0]
+    return scene, length, endpoints
+
+
+def manual_trial(rng, scene, endpoints, click_sigma):
+    thumb, scale = fit_within(scene, DISPLAY_MAX_SIDE)
+    start = time.perf_counter()
+    for _ in range(2):
+        # What each click still costs: the canvas re-sent to the click component
+        cv2.imencode(".png", thumb)
+    seconds = time.perf_counter() - start
+    clicks = [np.round((p * scale + rng.normal(0, click_sigma, 2))) / scale for p in endpoints]
+    return seconds, float(np.linalg.norm(clicks[0] - clicks[1]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Automatic vs manual calibration: accuracy and latency")
+    parser.add_argument("--scenes", type=int, default=50)
+    parser.add_argument("--kind", choices=sorted(calibration.DETECTORS), default="aruco")
+    parser.add_argument("--click-sigma", type=float, default=2.0, help="click error, display pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    auto_ms, auto_err, manual_ms, manual_err = [], [], [], []
+    missed = 0
+    for _ in range(args.scenes):
+        scene, length, endpoints = make_scene(rng, args.kind)
+        start = time.perf_counter()
+        reference = calibration.detect_reference(scene, args.kind)
+        auto_ms.append((time.perf_counter() - start) * 1000)
+        if reference is None:
+            missed += 1
+        else:
+            auto_err.append(abs(reference.pixel_length - length) / length * 100)
+        seconds, clicked = manual_trial(rng, scene, endpoints, args.click_sigma)
+        manual_ms.append(seconds * 1000)
+        manual_err.append(abs(clicked - length) / length * 100)
+
+    def report(label, ms, err):
+        if not err:
+            print(f"{label:<8} no detections")
+            return
+        print(f"{label:<8} latency p50 {statistics.median(ms):7.1f} ms  p95 {np.percentile(ms, 95):7.1f} ms   "
+              f"error mean {statistics.fmean(err):5.2f}%  p95 {np.percentile(err, 95):5.2f}%")
+
+    print(f"{args.scenes} synthetic {args.kind} scenes at {SCENE_SIZE[1]}x{SCENE_SIZE[0]}")
+    report("auto", auto_ms, auto_err)
+    report("manual", manual_ms, manual_err)
+    print(f"auto missed {missed}/{args.scenes}; manual also needs 2 click round trips per image")
+
+
+if __name__ == "__main__":
+    main()
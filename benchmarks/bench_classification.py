@@ -0,0 +1,72 @@
+# benchmarks/bench_classification.py
+# Times nutrition.classify_frame from 1k to 1M rows and reports the cost per row, which should
+# stay flat if the engine scales linearly. The scalar get_status loop is timed at small sizes
+# for reference.
+#
+#   python -m benchmarks.bench_classification [--max-rows 1000000]
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from nutrition import classify_frame, compute_bmi, get_status
+
+
+def synthetic_cohort(n, seed=0):
+    rng = np.random.default_rng(seed)
+    height = rng.uniform(60, 180, n)
+    return pd.DataFrame({
+        "age": rng.integers(0, 19, n),
+        "height": height,
+        "weight": height * rng.uniform(0.08, 0.4, n),
+        "arm": rng.uniform(10, 18, n),
+    })
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for vectorized nutrition classification")
+    parser.add_argument("--max-rows", type=int, default=1_000_000)
+    parser.add_argument("--tolerance", type=float, default=3.0,
+                        help="fail if ns/row at the largest size exceeds this multiple of the 10k-row figure")
+    args = parser.parse_args(argv)
+
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000, 10_000_000) if n <= args.max_rows]
+    print(f"{'rows':>10} {'vectorized s':>13} {'ns/row':>8} {'scalar ns/row':>14}")
+    per_row = {}
+    for n in sizes:
+        df = synthetic_cohort(n)
+        seconds = best_of(lambda: classify_frame(df))
+        per_row[n] = seconds / n * 1e9
+        scalar = ""
+        if n <= 100_000:
+            rows = list(zip(df["weight"], df["height"]))
+            scalar_s = best_of(lambda: [get_status(compute_bmi(w, h)) for w, h in rows], repeat=1)
+            scalar = f"{scalar_s / n * 1e9:14.0f}"
+        print(f"{n:>10} {seconds:13.4f} {per_row[n]:8.1f} {scalar:>14}")
+
+    # Agreement with the scalar rules on a sample
+    sample = synthetic_cohort(10_000, seed=1)
+    classified = classify_frame(sample)
+    expected = [get_status(compute_bmi(w, h)) for w, h in zip(sample["weight"], sample["height"])]
+    mismatches = int((classified["status"].astype(str).to_numpy() != np.array(expected)).sum())
+    print(f"\nscalar/vectorized status mismatches on 10k rows: {mismatches}")
+
+    reference = per_row.get(10_000, next(iter(per_row.values())))
+    ratio = per_row[sizes[-1]] / reference
+    print(f"ns/row at {sizes[-1]:,} rows is {ratio:.2f}x the 10k-row figure")
+    return 1 if mismatches or ratio > args.tolerance else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
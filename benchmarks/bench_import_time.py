@@ -0,0 +1,83 @@
+# benchmarks/bench_import_time.py
+# Import-time profile of the app's modules, from `python -X importtime` in a fresh interpreter per
+# module. The login path (auth, offline_queue, warmup) should stay free of numpy / pandas / cv2 /
+# mediapipe / google.generativeai; --check fails if any of those show up under it, or if any
+# profiled module fails to import at all.
+#
+#   python -m benchmarks.bench_import_time [--top 10] [--json import_times.json] [--check]
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGIN_PATH = ("auth", "offline_queue", "warmup")
+FEATURE_MODULES = ("nutrition", "zscore", "child_records", "view_data", "dashboard",
+                   "height_module", "muac_module", "food_module")
+HEAVY = ("numpy", "pandas", "cv2", "mediapipe", "google.generativeai", "tensorflow", "torch")
+
+
+def profile(module):
+    # (exit code, [(package, self_us, cumulative_us)] for every import triggered by `import module`, other stderr)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return proc.returncode, rows, "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))
+
+
+def summarize(module, top):
+    code, rows, stderr = profile(module)
+    if code:
+        last = stderr.strip().splitlines()[-1] if stderr.strip() else "missing dependency?"
+        return {"module": module, "error": f"import failed ({last})"}
+    total = next((cum for name, _, cum in rows if name == module), sum(s for _, s, _ in rows))
+    heavy = sorted({name.split(".")[0] if not name.startswith("google.") else "google.generativeai"
+                    for name, _, _ in rows if any(name == h or name.startswith(h + ".") for h in HEAVY)})
+    # Slowest imports by cumulative time (the module itself comes first)
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[:top]
+    return {"module": module, "total_ms": total / 1000, "heavy": heavy,
+            "slowest": [(name, cum / 1000) for name, _, cum in slowest]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the app modules")
+    parser.add_argument("modules", nargs="*", help="modules to profile (default: login path and features)")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per module")
+    parser.add_argument("--json", help="write the results here, e.g. to track them across commits")
+    parser.add_argument("--check", action="store_true",
+                        help="exit 1 if the login path imports a heavy stack or any module fails to import")
+    args = parser.parse_args(argv)
+
+    results = [summarize(m, args.top) for m in args.modules or LOGIN_PATH + FEATURE_MODULES]
+    failed, broken = False, []
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<16} {r['error']}")
+            broken.append(r["module"])
+            continue
+        heavy = f"  heavy: {', '.join(r['heavy'])}" if r["heavy"] else ""
+        print(f"{r['module']:<16} {r['total_ms']:9.1f} ms{heavy}")
+        for name, ms in r["slowest"]:
+            print(f"    {ms:9.1f} ms  {name}")
+        if r["module"] in LOGIN_PATH and r["heavy"]:
+            failed = True
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.check and (failed or broken):
+        if failed:
+            print("login path imports a heavy stack")
+        if broken:
+            print(f"failed to import: {', '.join(broken)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
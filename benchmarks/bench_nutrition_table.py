@@ -0,0 +1,114 @@
+# benchmarks/bench_nutrition_table.py
+# Replays the recorded Gemini answers in benchmarks/corpus/nutrition_responses through the
+# table parser. It checks row counts and calorie totals against expected.json, compares them
+# with the old keyword-filter parser, and times whole-text and chunked (streaming) parsing.
+#
+#   python -m benchmarks.bench_nutrition_table [--repeat 2000] [--chunk 16]
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+from nutrition_table import NutritionTableParser, parse_nutrition_table
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "nutrition_responses")
+
+
+def legacy_row_count(response):
+    # The parser run_food_scanner used before nutrition_table.py, kept for comparison
+    header_keywords = ["Food Item", "Quantity", "Calories", "Protein", "Carbs", "Fats", "Vitamins", "Minerals"]
+    rows = 0
+    for line in response.strip().split("\n"):
+        if not line.strip() or set(line.strip()).issubset(set('-| ')):
+            continue
+        if any(keyword in line for keyword in header_keywords):
+            continue
+        if '|' in line and len(line.split('|')) >= 5:
+            rows += 1
+    return rows
+
+
+def parse_streamed(response, chunk):
+    parser = NutritionTableParser()
+    for i in range(0, len(response), chunk):
+        parser.feed(response[i:i + chunk])
+    parser.close()
+    return parser.rows
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS, "expected.json")) as f:
+        expected = json.load(f)
+    corpus = {}
+    for name in expected:
+        with open(os.path.join(CORPUS, name)) as f:
+            corpus[name] = f.read()
+    return corpus, expected
+
+
+def check(corpus, expected, chunk):
+    failures = 0
+    print(f"{'response':<28} {'rows':>5} {'legacy':>7} {'kcal':>8}  result")
+    for name, response in corpus.items():
+        want = expected[name]
+        df = parse_nutrition_table(response)
+        rows = 0 if df is None else len(df)
+        kcal = 0.0 if df is None else float(df["Calories (kcal)"].fillna(0).sum())
+        streamed = parse_streamed(response, chunk)
+        ok = (
+            rows == want["rows"]
+            and math.isclose(kcal, want["calories"], abs_tol=0.01)
+            and len(streamed) == rows
+        )
+        failures += not ok
+        print(f"{name:<28} {rows:>5} {legacy_row_count(response):>7} {kcal:>8.1f}  {'ok' if ok else 'MISMATCH'}")
+    return failures
+
+
+def bench(corpus, repeat, chunk):
+    responses = list(corpus.values())
+    total_bytes = sum(len(r) for r in responses) * repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            legacy_row_count(response)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            parser = NutritionTableParser()
+            parser.feed(response)
+            parser.close()
+    whole_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            parse_streamed(response, chunk)
+    streamed_s = time.perf_counter() - start
+
+    mb = total_bytes / 1e6
+    print(f"\n{len(responses) * repeat} responses, {mb:.1f} MB")
+    print(f"legacy filter (no coercion): {mb / legacy_s:8.1f} MB/s")
+    print(f"parser, whole text:          {mb / whole_s:8.1f} MB/s")
+    print(f"parser, {chunk}-char chunks:     {mb / streamed_s:8.1f} MB/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corpus check and benchmark for the nutrition table parser")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=16, help="streaming chunk size in characters")
+    args = parser.parse_args(argv)
+
+    corpus, expected = load_corpus()
+    failures = check(corpus, expected, args.chunk)
+    bench(corpus, args.repeat, args.chunk)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
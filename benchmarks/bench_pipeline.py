@@ -0,0 +1,136 @@
+# benchmarks/bench_pipeline.py
+# Offline end-to-end benchmark of the measurement, scan and data pipelines, reported per stage
+# (p50 / p95 from tracing). Nothing leaves the machine:
+#   images   --images DIR (jpg / png), or deterministic synthetic photos generated in memory
+#   LLM      scan_cache.StubModel with --llm-latency seconds of simulated round trip
+#   database an in-memory SQLiteBackend behind the real DataAccess
+# Every iteration starts from cold caches (image, landmark and scan caches), so each stage is
+# actually exercised.
+#
+#   python -m benchmarks.bench_pipeline [--iterations 20] [--json out.json]
+#   python -m benchmarks.bench_pipeline --baseline out.json --tolerance 1.5   # exit 1 on a p95 regression
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+import anthropometry
+import calibration
+import tracing
+from child_records import child_row, measurement
+from data_access import DataAccess, SQLiteBackend
+from image_cache import ImageCache
+from nutrition_table import NUTRITION_PROMPT, parse_nutrition_table
+from scan_cache import ScanCache, StubModel
+
+SYNTHETIC_SIZE = (3024, 4032)  # h, w
+
+
+def synthetic_images(n, seed=0):
+    # Smooth random scenes saved as JPEG, so decode cost resembles a phone photo
+    rng = np.random.default_rng(seed)
+    h, w = SYNTHETIC_SIZE
+    for _ in range(n):
+        small = Image.fromarray(rng.integers(0, 255, (h // 32, w // 32, 3), dtype=np.uint8))
+        buf = io.BytesIO()
+        small.resize((w, h), Image.BICUBIC).save(buf, format="JPEG", quality=90)
+        yield buf.getvalue()
+
+
+def fixture_images(directory):
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if path.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(path, "rb") as f:
+                yield f.read()
+
+
+def run_measurement(data, with_pose):
+    # The landmark LRU is process-wide; with few images most pose runs would be cache hits
+    with anthropometry._cache_lock:
+        anthropometry._cache.clear()
+    entry = ImageCache().get(data)
+    if with_pose:
+        entry.landmarks()
+    calibration.detect_reference(entry.rgb)
+    return entry
+
+
+def run_scan(data, llm_latency):
+    from food_module import get_nutrition_response
+    image = Image.open(io.BytesIO(data))
+    text = get_nutrition_response(image, NUTRITION_PROMPT, model=StubModel(latency=llm_latency),
+                                  cache=ScanCache(":memory:"), original_bytes=len(data))
+    parse_nutrition_table(text)
+
+
+def run_data(store, i):
+    child = child_row("bench", f"child-{i % 50}")
+    store.ensure_children([child])
+    store.insert_nutrition(measurement("bench", child["name"], weight=12.0 + i % 5, height=90.0, arm=13.0,
+                                       bmi=14.8, status="Severe Malnutrition"))
+    store.latest_measurements(child["id"])
+    store.status_counts("bench")
+
+
+def compare(snapshot, baseline, tolerance):
+    # Stages whose p95 grew beyond tolerance x the baseline's
+    regressions = []
+    for name, stats in snapshot.items():
+        before = baseline.get(name, {}).get("p95_ms")
+        if before and stats["p95_ms"] and stats["p95_ms"] > before * tolerance:
+            regressions.append((name, before, stats["p95_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage latency of the measurement, scan and data pipelines")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--images", help="directory of fixture photos (default: synthetic)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated model round trip, seconds")
+    parser.add_argument("--no-pose", action="store_true", help="skip MediaPipe (e.g. where it isn't installed)")
+    parser.add_argument("--memory", action="store_true", help="track per-stage Python heap peaks (slower)")
+    parser.add_argument("--json", help="write the per-stage summary here")
+    parser.add_argument("--baseline", help="earlier --json output to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    tracing._tracer = tracing.Tracer(enabled=True, memory=args.memory)
+    images = list(fixture_images(args.images) if args.images else synthetic_images(min(args.iterations, 5)))
+    if not images:
+        parser.error(f"no images in {args.images}")
+    store = DataAccess(SQLiteBackend(), cache_ttl=0)
+
+    for i in range(args.iterations):
+        data = images[i % len(images)]
+        with tracing.stage("pipeline.measure"):
+            run_measurement(data, not args.no_pose)
+        with tracing.stage("pipeline.scan"):
+            run_scan(data, args.llm_latency)
+        with tracing.stage("pipeline.data"):
+            run_data(store, i)
+
+    snapshot = tracing.get_tracer().snapshot()
+    print(f"{'stage':<28}{'calls':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'rss MB':>9}{'heap MB':>9}")
+    for name, s in snapshot.items():
+        heap = f"{s['peak_heap_mb']:9.1f}" if s["peak_heap_mb"] is not None else f"{'-':>9}"
+        rss = f"{s['peak_rss_mb']:9.0f}" if s["peak_rss_mb"] is not None else f"{'-':>9}"
+        print(f"{name:<28}{s['calls']:>6}{s['p50_ms']:10.2f}{s['p95_ms']:10.2f}{s['max_ms']:10.2f}{rss}{heap}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(snapshot, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(snapshot, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.2f} -> {after:.2f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# benchmarks/bench_upload_prep.py
+# Compares bytes sent, round-trip latency and parse success across compression levels
+# on a local folder of meal photos.
+#
+#   python -m benchmarks.bench_upload_prep photos/ --levels 512:60 1024:80 1600:90 0:95
+#   python -m benchmarks.bench_upload_prep photos/ --model gemini   # real API, uses quota
+#
+# A level is LONG_EDGE:QUALITY (0 keeps the original size). The default stub model only
+# measures encoding cost; pass --model gemini to include the uplink and the parse rate.
+import argparse
+import os
+import time
+
+from PIL import Image
+
+from nutrition_table import NUTRITION_PROMPT, parse_nutrition_table
+from scan_cache import StubModel
+from upload_prep import prepare_upload
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_corpus(folder):
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [(p, os.path.getsize(p)) for p in paths]
+
+
+def parse_level(text):
+    long_edge, quality = text.split(":")
+    return int(long_edge), int(quality)
+
+
+def run_level(model, corpus, long_edge, quality, fmt):
+    sent = saved = parsed = 0
+    prep_s = rtt_s = 0.0
+    for path, original_bytes in corpus:
+        with Image.open(path) as image:
+            start = time.perf_counter()
+            prepared = prepare_upload(image, long_edge=long_edge, fmt=fmt, quality=quality,
+                                      original_bytes=original_bytes)
+            prep_s += time.perf_counter() - start
+        sent += len(prepared.data)
+        saved += prepared.bytes_saved
+        start = time.perf_counter()
+        try:
+            text = model.generate_content([prepared.blob, NUTRITION_PROMPT]).text
+        except Exception:
+            text = None
+        rtt_s += time.perf_counter() - start
+        parsed += text is not None and parse_nutrition_table(text) is not None
+    n = len(corpus)
+    return {
+        "level": f"{long_edge or 'orig'}:{quality}",
+        "avg_kb_sent": sent / n / 1024,
+        "avg_kb_saved": saved / n / 1024,
+        "avg_prep_ms": prep_s / n * 1000,
+        "avg_rtt_ms": rtt_s / n * 1000,
+        "parse_rate": parsed / n,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare upload compression levels on a local photo corpus")
+    parser.add_argument("corpus", help="folder of meal photos")
+    parser.add_argument("--levels", nargs="+", default=["512:60", "768:75", "1024:80", "1600:90", "0:95"])
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "WEBP"])
+    parser.add_argument("--model", default="stub", choices=["stub", "gemini"])
+    args = parser.parse_args(argv)
+
+    if args.model == "gemini":
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+        load_dotenv()
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        model = genai.GenerativeModel("gemini-1.5-flash")
+    else:
+        model = StubModel()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No images in {args.corpus}")
+
+    print(f"{len(corpus)} images, format {args.format}, model {args.model}")
+    print(f"{'level':>10} {'KB sent':>9} {'KB saved':>9} {'prep ms':>8} {'rtt ms':>8} {'parsed':>7}")
+    for level in args.levels:
+        long_edge, quality = parse_level(level)
+        r = run_level(model, corpus, long_edge, quality, args.format)
+        print(f"{r['level']:>10} {r['avg_kb_sent']:9.1f} {r['avg_kb_saved']:9.1f} "
+              f"{r['avg_prep_ms']:8.1f} {r['avg_rtt_ms']:8.1f} {r['parse_rate']:7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/bench_zscores.py
+# Times zscore.compute_zscores on large synthetic cohorts. It uses the real WHO tables when
+# WHO_TABLES_DIR has them. Otherwise it builds smooth synthetic LMS tables of the same shape,
+# which is fine for timing but the z-scores themselves are meaningless.
+#
+#   python -m benchmarks.bench_zscores [--rows 1000000]
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import zscore
+
+
+def synthetic_tables(directory):
+    age = np.arange(0, 1857)
+    length = np.round(np.arange(45.0, 120.05, 0.1), 1)
+    specs = {
+        "weianthro": ("age", age, 3.3 + 0.009 * age, 0.13),
+        "lenanthro": ("age", age, 50 + 0.05 * age, 0.04),
+        "bmianthro": ("age", age, 13.4 + 0.001 * age, 0.08),
+        "wflanthro": ("length", length, 0.0016 * length ** 1.9, 0.09),
+        "wfhanthro": ("height", length, 0.0016 * length ** 1.9, 0.09),
+    }
+    for stem, (index, x, m, s) in specs.items():
+        frames = [pd.DataFrame({"sex": sex, index: x, "l": -0.3, "m": m * (1 - 0.03 * (sex - 1)), "s": s})
+                  for sex in (1, 2)]
+        pd.concat(frames).to_csv(f"{directory}/{stem}.txt", sep="\t", index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of vectorized WHO z-scores")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if not zscore.tables_available():
+        tmp = tempfile.TemporaryDirectory()
+        synthetic_tables(tmp.name)
+        zscore.WHO_TABLES_DIR = tmp.name
+        for indicator in zscore.INDICATORS:
+            zscore._tables[indicator] = zscore.LMSTable.load(indicator, tmp.name)
+        print("WHO tables not found; timing with synthetic LMS tables")
+
+    start = time.perf_counter()
+    for indicator in zscore.INDICATORS:
+        zscore.get_table(indicator)
+    print(f"table load: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    for n in sorted({10_000, 100_000, args.rows}):
+        sex = rng.integers(1, 3, n)
+        age_days = rng.uniform(0, 1856, n)
+        height = 50 + 0.05 * age_days + rng.normal(0, 3, n)
+        weight = 0.0016 * height ** 1.9 * rng.normal(1, 0.1, n)
+        start = time.perf_counter()
+        scores = zscore.compute_zscores(sex, age_days, weight, height)
+        seconds = time.perf_counter() - start
+        valid = np.isfinite(scores["whz"]).mean()
+        print(f"{n:>10} rows: {seconds:8.3f} s  {seconds / n * 1e9:7.1f} ns/row  ({valid:.0%} with WHZ)")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# bulk_import.py
+# Imports historical survey rows from CSV or Excel into nutrition_data.
+#
+#   python bulk_import.py survey_2023.xlsx --username mannitha
+#   python bulk_import.py survey.csv --username mannitha --dry-run --errors rejected.csv
+#
+# Columns are matched case-insensitively: name, age, weight, height, arm (optional username, sex,
+# age_months, measured_at). Rows are validated and classified in vectorized chunks, then appended
+# to each child's measurement series with the same keyed upsert as the app. Rows without a
+# measured_at date are stamped with the import date, so re-running an import the same day (or any
+# import of dated rows) doesn't create duplicates.
+import argparse
+import datetime
+import os
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from data_access import child_id, get_data_access
+from nutrition import classify_frame
+from zscore import add_zscores, normalize_sex, tables_available
+
+REQUIRED_COLUMNS = ["name", "age", "weight", "height"]
+NUMERIC_COLUMNS = ["age", "weight", "height", "arm", "age_months"]
+COLUMN_ALIASES = {
+    "child name": "name", "child": "name",
+    "age (years)": "age",
+    "weight (kg)": "weight",
+    "height (cm)": "height",
+    "arm circumference (cm)": "arm", "muac": "arm", "muac (cm)": "arm",
+    "gender": "sex", "age (months)": "age_months",
+    "date": "measured_at", "visit date": "measured_at", "measurement date": "measured_at",
+}
+# Plausible ranges; anything outside is rejected rather than classified
+VALID_RANGES = {"age": (0, 19), "weight": (0.5, 200), "height": (30, 250), "arm": (5, 40), "age_months": (0, 239)}
+CHUNK_ROWS = 50_000
+INSERT_BATCH = 500
+
+
+def read_source(path, chunk_rows=CHUNK_ROWS):
+    if path.lower().endswith(".xlsx"):
+        df = pd.read_excel(path, engine="openpyxl")
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def normalize_columns(df):
+    renamed = {c: COLUMN_ALIASES.get(c.strip().lower(), c.strip().lower()) for c in df.columns}
+    return df.rename(columns=renamed)
+
+
+def validate(df, username=None):
+    # Returns (valid rows, rejected rows with a `reason` column)
+    df = normalize_columns(df)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    if "arm" not in df:
+        df["arm"] = np.nan
+    if "age_months" not in df:
+        # Whole years only; z-scores are coarse for under-fives without an explicit months column
+        df["age_months"] = pd.to_numeric(df["age"], errors="coerce") * 12
+    df["sex"] = normalize_sex(df["sex"].to_numpy()) if "sex" in df else 0
+    today = pd.Timestamp(datetime.date.today(), tz="UTC")
+    if "measured_at" in df:
+        df["measured_at"] = pd.to_datetime(df["measured_at"], errors="coerce", utc=True).fillna(today)
+    else:
+        df["measured_at"] = today
+    if username is not None:
+        df["username"] = username
+    elif "username" not in df:
+        raise ValueError("No username column; pass --username")
+
+    df["name"] = df["name"].astype("string").str.strip().fillna("")
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+
+    reason = pd.Series("", index=df.index, dtype="object")
+    reason[(df["name"] == "").to_numpy(bool)] = "missing name"
+    for column in REQUIRED_COLUMNS[1:]:
+        reason[(reason == "") & df[column].isna()] = f"missing or non-numeric {column}"
+    for column, (low, high) in VALID_RANGES.items():
+        out_of_range = df[column].notna() & ~df[column].between(low, high)
+        reason[(reason == "") & out_of_range] = f"{column} out of range {low}-{high}"
+    dupes = df.duplicated(subset=["username", "name", "measured_at"], keep="first")
+    reason[(reason == "") & dupes] = "duplicate measurement in file"
+
+    ok = reason == ""
+    rejected = df[~ok].assign(reason=reason[~ok])
+    return df[ok], rejected
+
+
+def to_entries(df):
+    classified = classify_frame(df)
+    if tables_available():
+        classified = add_zscores(classified)
+    usernames = classified["username"].astype(str)
+    names = classified["name"].astype(str)
+    out = pd.DataFrame({
+        "id": [str(uuid.uuid4()) for _ in range(len(classified))],
+        "child_id": [child_id(u, n) for u, n in zip(usernames, names)],
+        "username": usernames,
+        "name": names,
+        "age": classified["age"].round().astype(int),
+        "weight": classified["weight"].astype(float),
+        "height": classified["height"].astype(float),
+        "arm": classified["arm"].astype(float),
+        "bmi": classified["bmi"].astype(float),
+        "status": classified["status"].astype(str),
+        "sex": classified["sex"].where(classified["sex"] > 0).astype("Int64"),
+        "age_months": classified["age_months"].astype(float),
+        "source": "manual",
+        "measured_at": classified["measured_at"].map(lambda t: t.isoformat()),
+    })
+    for column in ("waz", "haz", "whz", "baz"):
+        if column in classified:
+            out[column] = classified[column].astype(float)
+    # JSON has no NaN; a missing arm measurement goes in as null
+    return out.astype(object).where(out.notna(), None).to_dict("records")
+
+
+def to_children(entries):
+    # One children row per distinct child; the latest sex given for a child wins
+    children = {}
+    for e in entries:
+        children[e["child_id"]] = {"id": e["child_id"], "username": e["username"], "name": e["name"], "sex": e["sex"]}
+    return list(children.values())
+
+
+def run_import(path, username=None, dry_run=False, errors_path=None, data=None):
+    data = data or get_data_access()
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    rejected_parts = []
+    for chunk in read_source(path):
+        valid, rejected = validate(chunk, username)
+        totals["rows"] += len(chunk)
+        totals["rejected"] += len(rejected)
+        if len(rejected):
+            rejected_parts.append(rejected)
+        entries = to_entries(valid) if len(valid) else []
+        if dry_run:
+            continue
+        data.ensure_children(to_children(entries))
+        for start in range(0, len(entries), INSERT_BATCH):
+            inserted, duplicates = data.insert_nutrition_batch(entries[start:start + INSERT_BATCH])
+            totals["inserted"] += len(inserted)
+            totals["duplicates"] += len(duplicates)
+    if errors_path and rejected_parts:
+        pd.concat(rejected_parts).to_csv(errors_path, index=False)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import survey rows into nutrition_data")
+    parser.add_argument("path", help="CSV or Excel file")
+    parser.add_argument("--username", help="health worker the rows belong to (if the file has no username column)")
+    parser.add_argument("--dry-run", action="store_true", help="validate and classify without writing")
+    parser.add_argument("--errors", help="write rejected rows and reasons to this CSV")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} not found")
+    if args.path.lower().endswith(".xls"):
+        # Legacy .xls needs xlrd, which isn't a dependency
+        parser.error(f"{args.path}: .xls workbooks aren't supported; save it as .xlsx or .csv")
+    totals = run_import(args.path, args.username, args.dry_run, args.errors)
+    print(f"{totals['rows']} rows: {totals['inserted']} inserted, {totals['duplicates']} already present, "
+          f"{totals['rejected']} rejected{' (dry run)' if args.dry_run else ''}")
+    return 1 if totals["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
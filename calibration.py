@@ -0,0 +1,235 @@
+# calibration.py
+# Automatic scale calibration from a reference object in the photo. This replaces the two
+# calibration clicks, each of which costs a rerun. CALIBRATION_REFERENCE picks what to look for:
+#   aruco  a printed ArUco marker from ARUCO_DICT (default DICT_4X4_50); its length is one side
+#   card   an ID-1 card (bank / ID card, 85.6 x 54 mm); its length is the long edge
+# Detection measures the reference in full-res pixels, and cm per pixel is reference_length / that,
+# exactly as with two clicks. Clicking stays available as the fallback.
+# Results are cached per image. With a camera rig name they are also saved per rig and image size
+# (RIG_CALIBRATIONS), so a fixed setup only needs the reference in its first shot.
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import streamlit as st
+from streamlit_image_coordinates import streamlit_image_coordinates
+
+from anthropometry import fit_within
+from app_state import rerun_fragment, widget_key
+from image_cache import click_overlay
+from tracing import traced
+
+CALIBRATION_REFERENCE = os.getenv("CALIBRATION_REFERENCE", "aruco")
+ARUCO_DICT = os.getenv("ARUCO_DICT", "DICT_4X4_50")
+# Detection runs on a proxy no larger than this; markers stay well resolved and it's ~10x cheaper
+CALIBRATION_MAX_SIDE = int(os.getenv("CALIBRATION_MAX_SIDE", 1600))
+RIG_CALIBRATIONS = os.getenv("RIG_CALIBRATIONS", os.path.join(".cache", "rigs.json"))
+
+CARD_ASPECT = 85.6 / 53.98
+CARD_ASPECT_TOLERANCE = 0.06
+CARD_MIN_AREA = 0.002  # fraction of the image; smaller quadrilaterals are text and clutter
+REFERENCE_LABELS = {"aruco": "ArUco marker", "card": "ID card"}
+CALIBRATION_CACHE_SIZE = 64
+
+
+class Reference:
+    # A detected reference: its length in full-res pixels, the measured edge's endpoints and its outline
+    __slots__ = ("kind", "pixel_length", "endpoints", "outline")
+
+    def __init__(self, kind, pixel_length, endpoints, outline):
+        self.kind = kind
+        self.pixel_length = pixel_length
+        self.endpoints = endpoints
+        self.outline = outline
+
+    def cm_per_pixel(self, reference_length):
+        return reference_length / self.pixel_length
+
+
+def _edge_lengths(quad):
+    return np.linalg.norm(quad - np.roll(quad, -1, axis=0), axis=1)
+
+
+def detect_aruco(gray):
+    # (outline, side length in px, measured edge) for the largest marker, or None
+    dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, ARUCO_DICT))
+    if hasattr(cv2.aruco, "ArucoDetector"):
+        detector = cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+        corners, ids, _ = detector.detectMarkers(gray)
+    else:
+        corners, ids, _ = cv2.aruco.detectMarkers(gray, dictionary)
+    if ids is None or not len(corners):
+        return None
+    quad = max((c.reshape(4, 2) for c in corners), key=lambda q: cv2.contourArea(q.astype(np.float32)))
+    # Mean of the four sides absorbs mild perspective
+    return quad, float(_edge_lengths(quad).mean()), (quad[0], quad[1])
+
+
+def detect_card(gray):
+    # (outline, long-edge length in px, long edge) for the largest card-shaped quadrilateral, or None
+    edges = cv2.dilate(cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150), None)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = CARD_MIN_AREA * gray.size
+    best = None
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area or (best is not None and area <= best[0]):
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) != 4 or not cv2.isContourConvex(approx):
+            continue
+        quad = approx.reshape(4, 2).astype(np.float32)
+        sides = _edge_lengths(quad)
+        long_side, short_side = (sides[0] + sides[2]) / 2, (sides[1] + sides[3]) / 2
+        if long_side < short_side:
+            long_side, short_side = short_side, long_side
+        if short_side and abs(long_side / short_side - CARD_ASPECT) <= CARD_ASPECT_TOLERANCE * CARD_ASPECT:
+            best = (area, quad, long_side)
+    if best is None:
+        return None
+    _, quad, long_side = best
+    i = int(np.argmax(_edge_lengths(quad)))
+    return quad, float(long_side), (quad[i], quad[(i + 1) % 4])
+
+
+DETECTORS = {"aruco": detect_aruco, "card": detect_card}
+
+
+@traced("calibration.detect")
+def detect_reference(rgb, kind=CALIBRATION_REFERENCE, max_side=CALIBRATION_MAX_SIDE):
+    proxy, scale = fit_within(rgb, max_side)
+    found = DETECTORS[kind](cv2.cvtColor(proxy, cv2.COLOR_RGB2GRAY))
+    if found is None:
+        return None
+    outline, length, (a, b) = found
+    to_full = lambda p: (int(round(p[0] / scale)), int(round(p[1] / scale)))
+    return Reference(kind, length / scale, (to_full(a), to_full(b)), np.asarray(outline) / scale)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def reference_for(entry, kind=CALIBRATION_REFERENCE):
+    # One detection per distinct image and reference kind; None (not found) is cached too
+    key = (entry.digest, kind, CALIBRATION_MAX_SIDE)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    reference = detect_reference(entry.rgb, kind)
+    with _cache_lock:
+        _cache[key] = reference
+        while len(_cache) > CALIBRATION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return reference
+
+
+class RigCalibrations:
+    # cm per pixel by camera rig and image size, kept in a small JSON file
+    def __init__(self, path=RIG_CALIBRATIONS):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._rigs = json.load(f)
+        except (OSError, ValueError):
+            self._rigs = {}
+
+    @staticmethod
+    def _key(rig, size):
+        return f"{rig}@{size[0]}x{size[1]}"
+
+    def get(self, rig, size):
+        return self._rigs.get(self._key(rig, size))
+
+    def put(self, rig, size, cm_per_pixel):
+        key = self._key(rig, size)
+        with self._lock:
+            if self._rigs.get(key) == cm_per_pixel:
+                return
+            self._rigs[key] = cm_per_pixel
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._rigs, f, indent=1)
+            os.replace(tmp, self.path)
+
+
+_rigs = None
+_rigs_lock = threading.Lock()
+
+
+def get_rig_calibrations():
+    global _rigs
+    if _rigs is None:
+        with _rigs_lock:
+            if _rigs is None:
+                _rigs = RigCalibrations()
+    return _rigs
+
+
+def draw_reference(entry, reference):
+    canvas = entry.thumb_rgb.copy()
+    outline = np.round(reference.outline * entry.display_scale).astype(np.int32)
+    cv2.polylines(canvas, [outline], True, (0, 200, 0), 2)
+    a, b = (entry.to_display(*p) for p in reference.endpoints)
+    cv2.line(canvas, a, b, (255, 0, 0), 3)
+    return canvas
+
+
+def click_calibration(entry, reference_length, state, namespace):
+    # Manual fallback: two clicks on the reference. Call from inside a fragment.
+    st.markdown("**Click two points on the reference object**")
+    canvas = click_overlay(entry, state["points"], state, "overlay")
+    # Keyed per image: the component keeps returning its last click, which for an earlier upload
+    # would otherwise land on the new image as its first point
+    coords = streamlit_image_coordinates(canvas, key=widget_key(namespace, f"click_img_{entry.digest}"))
+
+    # Only a new click adds a point
+    if coords and coords != state.get("last_click") and len(state["points"]) < 2:
+        state["last_click"] = coords
+        state["points"].append(entry.to_full(coords['x'], coords['y']))
+        rerun_fragment()
+
+    if st.button("🔄 Reset Points", key=widget_key(namespace, "reset")):
+        state.update(points=[], result=None)
+        rerun_fragment()
+
+    if len(state["points"]) < 2:
+        return None
+    (x1, y1), (x2, y2) = state["points"]
+    pixel_dist = float(np.hypot(x2 - x1, y2 - y1))
+    return reference_length / pixel_dist if pixel_dist else None
+
+
+def calibrate(entry, reference_length, state, namespace):
+    # cm per full-res pixel from the detected reference, a saved rig or two clicks; None until known
+    mode = st.radio("Calibration", ["Automatic", "Click two points"], horizontal=True,
+                    key=widget_key(namespace, "calibration_mode"))
+    rig = st.text_input("Camera rig (optional)", key=widget_key(namespace, "rig"),
+                        help="Name a fixed camera setup to reuse its calibration on photos without the reference")
+    size = entry.rgb.shape[1::-1]
+    rigs = get_rig_calibrations()
+
+    if mode == "Automatic":
+        reference = reference_for(entry)
+        if reference is not None:
+            factor = reference.cm_per_pixel(reference_length)
+            st.image(draw_reference(entry, reference), caption=f"Detected {REFERENCE_LABELS[reference.kind]}")
+            if rig:
+                rigs.put(rig, size, factor)
+            return factor
+        saved = rigs.get(rig, size) if rig else None
+        if saved:
+            st.info(f"No {REFERENCE_LABELS[CALIBRATION_REFERENCE]} found; using the saved calibration for rig '{rig}'.")
+            return saved
+        st.warning(f"No {REFERENCE_LABELS[CALIBRATION_REFERENCE]} found; click its two ends instead.")
+
+    factor = click_calibration(entry, reference_length, state, namespace)
+    if factor and rig:
+        rigs.put(rig, size, factor)
+    return factor
@@ -0,0 +1,106 @@
+# child_records.py
+# Children and their measurement series. Every manual entry or photo estimate is appended to
+# nutrition_data as one row keyed by (child_id, measured_at); nothing is overwritten.
+# A child's id is uuid5 of (username, name), so entries made offline point at the same child the
+# server has without looking it up first.
+import datetime
+import uuid
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_access import get_data_access, child_id, LATEST_N
+from offline_queue import get_outbox, sync_now
+from zscore import DAYS_PER_MONTH
+
+SOURCES = ("manual", "photo")
+GROWTH_FIELDS = ("weight", "height", "arm")
+MIN_VELOCITY_DAYS = 1  # two readings on the same day say nothing about growth
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def child_row(username, name, sex=None):
+    return {"id": child_id(username, name), "username": username, "name": name, "sex": sex}
+
+
+def measurement(username, name, source="manual", measured_at=None, **values):
+    # A new series row; values are any nutrition_data columns (weight, height, arm, bmi, status, ...)
+    if source not in SOURCES:
+        raise ValueError(f"source must be one of {SOURCES}, not {source!r}")
+    return {
+        "id": str(uuid.uuid4()),
+        "child_id": child_id(username, name),
+        "username": username,
+        "name": name,
+        "source": source,
+        "measured_at": measured_at or now_iso(),
+        **values,
+    }
+
+
+def record(entry, sex=None, outbox=None):
+    # Queue the child (skipped server-side if it exists) and the measurement; children sync first
+    outbox = outbox or get_outbox()
+    outbox.enqueue("children", child_row(entry["username"], entry["name"], sex))
+    outbox.enqueue("nutrition_data", entry)
+    sync_now()
+    return entry["id"]
+
+
+def _days(timestamp):
+    return datetime.datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp() / 86400
+
+
+def growth_velocity(rows, fields=GROWTH_FIELDS):
+    # Least-squares change per month for each field over `rows` (any order). None where there are
+    # fewer than two readings or they span less than MIN_VELOCITY_DAYS; zero counts as not measured.
+    days = np.array([_days(row["measured_at"]) for row in rows], dtype=np.float64)
+    velocity = {}
+    for field in fields:
+        values = np.array([row.get(field) or np.nan for row in rows], dtype=np.float64)
+        ok = np.isfinite(values) & (values > 0)
+        if ok.sum() < 2 or np.ptp(days[ok]) < MIN_VELOCITY_DAYS:
+            velocity[field] = None
+            continue
+        slope = np.polyfit(days[ok], values[ok], 1)[0]
+        velocity[field] = round(float(slope * DAYS_PER_MONTH), 3)
+    return velocity
+
+
+def child_growth(username, name, n=LATEST_N, data=None):
+    # (latest n measurements newest first, velocity per month over them)
+    data = data or get_data_access()
+    rows = data.latest_measurements(child_id(username, name), n)
+    return rows, growth_velocity(rows)
+
+
+def save_photo_measurement(username, key, **values):
+    # "Save to child record" for the photo tools; values are height= and/or arm= in cm
+    with st.form(f"{key}_save"):
+        name = st.text_input("Child Name", key=f"{key}_child")
+        if st.form_submit_button("Save to child record") and name:
+            record(measurement(username, name, source="photo", **values))
+            st.success(f"Saved for {name}.")
+
+
+def show_child_growth(username):
+    st.header("Child Growth")
+    names = [c["name"] for c in get_data_access().children(username, columns="name")]
+    if not names:
+        st.info("No children recorded yet.")
+        return
+    name = st.selectbox("Child", names, key="growth_child")
+    rows, velocity = child_growth(username, name)
+    units = {"weight": "kg", "height": "cm", "arm": "cm"}
+    for col, field in zip(st.columns(len(GROWTH_FIELDS)), GROWTH_FIELDS):
+        value = velocity[field]
+        col.metric(f"{field.capitalize()} / month", "—" if value is None else f"{value:+.2f} {units[field]}")
+    df = pd.DataFrame(rows)
+    if len(df) > 1:
+        df["measured_at"] = pd.to_datetime(df["measured_at"], utc=True, format="mixed")
+        st.line_chart(df.set_index("measured_at")[["weight", "height"]].replace(0, np.nan).sort_index())
+    st.dataframe(df, use_container_width=True, hide_index=True)
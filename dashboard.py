@@ -0,0 +1,65 @@
+# dashboard.py
+# Supervisor dashboard. Every chart reads a rollup table that the database keeps current on insert
+# (see migrations/003_dashboard_rollups.sql), so rendering cost doesn't grow with the record history.
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from data_access import get_data_access
+from view_data import STATUSES
+
+INTAKE_DAYS = 30
+
+
+def status_frame(rows):
+    # Children per status in severity order; statuses nobody currently has are dropped
+    counts = pd.DataFrame(rows, columns=["status", "children"]).groupby("status")["children"].sum()
+    order = [s for s in STATUSES if s in counts.index] + [s for s in counts.index if s not in STATUSES]
+    counts = counts.reindex(order)
+    return counts[counts > 0]
+
+
+def intake_frame(rows):
+    # Average calories / protein per child per day
+    df = pd.DataFrame(rows, columns=["day", "name", "calories", "protein"])
+    if df.empty:
+        return df
+    df["day"] = pd.to_datetime(df["day"])
+    return df.groupby("day")[["calories", "protein"]].mean().sort_index()
+
+
+def run_dashboard(username, all_workers=False):
+    # all_workers reads every worker's rollups; the caller only allows it for supervisors
+    data = get_data_access()
+    owner = None if all_workers else username
+    st.header("Dashboard")
+
+    counts = status_frame(data.status_counts(owner))
+    latest = pd.DataFrame(data.child_latest(owner))
+    since = (datetime.date.today() - datetime.timedelta(days=INTAKE_DAYS)).isoformat()
+    intake = intake_frame(data.daily_intake(owner, since=since))
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Children", int(counts.sum()) if len(counts) else 0)
+    col2.metric("Severe", int(counts.get("Severe Malnutrition", 0)))
+    col3.metric(f"Avg kcal / child / day ({INTAKE_DAYS}d)",
+                f"{intake['calories'].mean():.0f}" if len(intake) else "—")
+
+    st.subheader("Children by current status")
+    if len(counts):
+        st.bar_chart(counts)
+    else:
+        st.info("No nutrition records yet.")
+
+    st.subheader(f"Average daily intake per child, last {INTAKE_DAYS} days")
+    if len(intake):
+        st.line_chart(intake)
+    else:
+        st.info("No food scans in this period.")
+
+    st.subheader("Latest measurement per child")
+    if len(latest):
+        columns = [c for c in ["username", "name", "status", "bmi", "arm", "whz", "measured_at"]
+                   if c in latest and (all_workers or c != "username")]
+        st.dataframe(latest[columns], use_container_width=True, hide_index=True)
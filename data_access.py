@@ -0,0 +1,533 @@
+# data_access.py
+# All reads and writes to users / children / nutrition_data / food_data go through here.
+# DATA_BACKEND=supabase (default) talks to the shared process-wide Supabase client;
+# DATA_BACKEND=sqlite:<path> runs the same queries against a local SQLite file, for tests and offline work.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from tracing import stage
+
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase")
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", 30))
+
+# Narrow projections instead of select("*")
+USER_COLUMNS = "username"
+NUTRITION_COLUMNS = ("id,child_id,username,name,age,weight,height,arm,bmi,status,sex,age_months,waz,haz,whz,baz,"
+                     "source,measured_at,created_at")
+CHILD_COLUMNS = "id,username,name,sex,created_at"
+# A child's time series: enough to plot growth and compute velocity
+SERIES_COLUMNS = "id,measured_at,weight,height,arm,bmi,status,whz,source"
+LATEST_N = int(os.getenv("CHILD_LATEST_N", 10))
+FOOD_COLUMNS = "id,username,name,meal_date,meal_time,nutrition_table,created_at"
+# Keyset pages are ordered by (created_at, id); both columns are always fetched
+CURSOR_COLUMNS = ("created_at", "id")
+PAGE_SIZE = int(os.getenv("VIEW_PAGE_SIZE", 50))
+
+JSON_COLUMNS = {"nutrition_table"}
+
+# Unique keys backing the upserts; created by migrations/001_unique_keys.sql, 004_child_series.sql
+# and 005_food_meal_date.sql
+USER_KEY = ("username",)
+CHILD_KEY = ("id",)
+NUTRITION_KEY = ("child_id", "measured_at")
+FOOD_KEY = ("username", "name", "meal_date", "meal_time")
+TABLE_KEYS = {"users": USER_KEY, "children": CHILD_KEY, "nutrition_data": NUTRITION_KEY, "food_data": FOOD_KEY}
+# Parents before the rows that reference them
+SYNC_ORDER = ("users", "children", "nutrition_data", "food_data")
+# A child's id is uuid5(CHILD_NAMESPACE, "username/name"); must match the backfill in
+# migrations/004_child_series.sql
+CHILD_NAMESPACE = uuid.UUID("ffc8e9f0-70ac-4135-8f43-cf507fb8e869")
+
+
+def child_id(username, name):
+    return str(uuid.uuid5(CHILD_NAMESPACE, f"{username}/{name}"))
+
+
+# Rollup tables refreshed by triggers on each base table; their cached reads go stale with it
+ROLLUPS = {
+    "nutrition_data": ("child_latest", "nutrition_status_counts"),
+    "food_data": ("daily_intake",),
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT,
+    password TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS children (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sex INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (username, name)
+);
+CREATE TABLE IF NOT EXISTS nutrition_data (
+    id TEXT PRIMARY KEY,
+    child_id TEXT REFERENCES children (id),
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    age INTEGER,
+    weight REAL,
+    height REAL,
+    arm REAL,
+    bmi REAL,
+    status TEXT,
+    sex INTEGER,
+    age_months REAL,
+    waz REAL,
+    haz REAL,
+    whz REAL,
+    baz REAL,
+    source TEXT NOT NULL DEFAULT 'manual',
+    measured_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS food_data (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    meal_date TEXT NOT NULL DEFAULT (date('now')),
+    meal_time TEXT,
+    nutrition_table TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS nutrition_data_child_id_measured_at_key ON nutrition_data (child_id, measured_at);
+CREATE UNIQUE INDEX IF NOT EXISTS food_data_username_name_meal_date_meal_time_key
+    ON food_data (username, name, meal_date, meal_time);
+"""
+
+# Same rollups and insert triggers as migrations/003_dashboard_rollups.sql (as amended by 004 and 005)
+SQLITE_ROLLUPS = """
+CREATE TABLE IF NOT EXISTS child_latest (
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    bmi REAL,
+    arm REAL,
+    whz REAL,
+    status TEXT,
+    measured_at TEXT NOT NULL,
+    PRIMARY KEY (username, name)
+);
+CREATE TABLE IF NOT EXISTS nutrition_status_counts (
+    username TEXT NOT NULL,
+    status TEXT NOT NULL,
+    children INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, status)
+);
+CREATE TABLE IF NOT EXISTS daily_intake (
+    username TEXT NOT NULL,
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    calories REAL NOT NULL DEFAULT 0,
+    protein REAL NOT NULL DEFAULT 0,
+    meals INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, name, day)
+);
+CREATE TRIGGER IF NOT EXISTS nutrition_data_rollup AFTER INSERT ON nutrition_data
+WHEN NEW.status IS NOT NULL AND NOT EXISTS (
+    SELECT 1 FROM child_latest
+     WHERE username = NEW.username AND name = NEW.name AND measured_at > NEW.measured_at
+)
+BEGIN
+    UPDATE nutrition_status_counts SET children = children - 1
+     WHERE (username, status) = (
+        SELECT username, status FROM child_latest WHERE username = NEW.username AND name = NEW.name
+     );
+    INSERT INTO child_latest (username, name, bmi, arm, whz, status, measured_at)
+    VALUES (NEW.username, NEW.name, NEW.bmi, NEW.arm, NEW.whz, NEW.status, NEW.measured_at)
+    ON CONFLICT (username, name) DO UPDATE SET
+        bmi = excluded.bmi, arm = excluded.arm, whz = excluded.whz,
+        status = excluded.status, measured_at = excluded.measured_at;
+    INSERT INTO nutrition_status_counts (username, status, children)
+    VALUES (NEW.username, NEW.status, 1)
+    ON CONFLICT (username, status) DO UPDATE SET children = children + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS food_data_rollup AFTER INSERT ON food_data
+BEGIN
+    INSERT INTO daily_intake (username, name, day, calories, protein, meals)
+    VALUES (
+        NEW.username, NEW.name, NEW.meal_date,
+        COALESCE(json_extract(NEW.nutrition_table, '$.calories'), 0),
+        COALESCE(json_extract(NEW.nutrition_table, '$.protein'), 0),
+        1
+    )
+    ON CONFLICT (username, name, day) DO UPDATE SET
+        calories = calories + excluded.calories,
+        protein = protein + excluded.protein,
+        meals = meals + 1;
+END;
+"""
+
+_SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "ilike": "LIKE"}
+
+
+class SupabaseBackend:
+    def __init__(self, client=None):
+        if client is None:
+            from supabase_client import get_supabase_client
+            client = get_supabase_client()
+        self.client = client
+
+    def select(self, table, columns, filters=(), order=None, limit=None):
+        query = self.client.table(table).select(columns)
+        for column, op, value in filters:
+            query = getattr(query, op)(column, value)
+        if order:
+            column, desc = order
+            query = query.order(column, desc=desc)
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def select_page(self, table, columns, filters, cursor=None, newer=False, limit=PAGE_SIZE):
+        # Newest first. cursor=(created_at, id) continues below it, or above it when newer=True.
+        query = self.client.table(table).select(columns)
+        for column, op, value in filters:
+            query = getattr(query, op)(column, value)
+        if cursor:
+            created_at, id_ = cursor
+            op = "gt" if newer else "lt"
+            query = query.or_(f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{id_})')
+        query = query.order("created_at", desc=True).order("id", desc=True)
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def insert(self, table, rows):
+        return self.client.table(table).insert(rows).execute().data
+
+    def update(self, table, values, filters):
+        query = self.client.table(table).update(values)
+        for column, op, value in filters:
+            query = getattr(query, op)(column, value)
+        return query.execute().data
+
+    def upsert(self, table, rows, on_conflict):
+        # ON CONFLICT DO NOTHING: PostgREST returns only the rows it actually inserted
+        return self.client.table(table).upsert(
+            rows, on_conflict=",".join(on_conflict), ignore_duplicates=True
+        ).execute().data
+
+
+class SQLiteBackend:
+    # Local stand-in for PostgREST: same select/insert surface, JSON columns stored as text
+    def __init__(self, path=":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SQLITE_SCHEMA)
+        self._db.executescript(SQLITE_ROLLUPS)
+        self._lock = threading.Lock()
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for column, op, value in filters:
+            if op == "in_":
+                clauses.append(f"{column} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{column} {_SQL_OPS[op]} ?")
+                params.append(value)
+        return clauses, params
+
+    def select(self, table, columns, filters=(), order=None, limit=None):
+        sql = f"SELECT {columns} FROM {table}"
+        clauses, params = self._where(filters)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order:
+            column, desc = order
+            sql += f" ORDER BY {column} {'DESC' if desc else 'ASC'}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [_decode_row(dict(row)) for row in rows]
+
+    def select_page(self, table, columns, filters, cursor=None, newer=False, limit=PAGE_SIZE):
+        clauses, params = self._where(filters)
+        if cursor:
+            op = ">" if newer else "<"
+            clauses.append(f"(created_at {op} ? OR (created_at = ? AND id {op} ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        sql = f"SELECT {columns} FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [_decode_row(dict(row)) for row in rows]
+
+    def insert(self, table, rows):
+        rows = rows if isinstance(rows, list) else [rows]
+        if not rows:
+            return []
+        columns = _union_columns(rows)
+        sql = f"INSERT INTO {table} ({','.join(columns)}) VALUES ({','.join('?' * len(columns))})"
+        with self._lock, self._db:
+            self._db.executemany(sql, [[_encode(c, row.get(c)) for c in columns] for row in rows])
+        return rows
+
+    def update(self, table, values, filters):
+        clauses, params = self._where(filters)
+        sql = f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in values)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock, self._db:
+            count = self._db.execute(sql, [_encode(c, v) for c, v in values.items()] + params).rowcount
+        return [values] * count
+
+    def upsert(self, table, rows, on_conflict):
+        rows = rows if isinstance(rows, list) else [rows]
+        if not rows:
+            return []
+        columns = _union_columns(rows)
+        sql = (f"INSERT INTO {table} ({','.join(columns)}) VALUES ({','.join('?' * len(columns))}) "
+               f"ON CONFLICT ({','.join(on_conflict)}) DO NOTHING")
+        inserted = []
+        with self._lock, self._db:
+            for row in rows:
+                if self._db.execute(sql, [_encode(c, row.get(c)) for c in columns]).rowcount:
+                    inserted.append(row)
+        return inserted
+
+
+def _union_columns(rows):
+    # A batch can mix manual and photo measurements; missing columns go in as NULL, as with PostgREST
+    return list(dict.fromkeys(c for row in rows for c in row))
+
+
+def _encode(column, value):
+    return json.dumps(value) if column in JSON_COLUMNS and value is not None else value
+
+
+def _decode_row(row):
+    for column in JSON_COLUMNS & row.keys():
+        if isinstance(row[column], str):
+            row[column] = json.loads(row[column])
+    return row
+
+
+def make_backend(spec=DATA_BACKEND):
+    if spec.startswith("sqlite"):
+        _, _, path = spec.partition(":")
+        return SQLiteBackend(path or ":memory:")
+    return SupabaseBackend()
+
+
+class QueryMetrics:
+    def __init__(self):
+        self._stats = defaultdict(lambda: {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            stat = self._stats[name]
+            stat["calls"] += 1
+            stat["total_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**stat, "avg_ms": stat["total_ms"] / stat["calls"]}
+                for name, stat in self._stats.items()
+            }
+
+
+class DataAccess:
+    def __init__(self, backend=None, cache_ttl=READ_CACHE_TTL):
+        self.backend = backend or make_backend()
+        self.cache_ttl = cache_ttl
+        self.metrics = QueryMetrics()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    # -- plumbing --
+
+    def _timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with stage(f"db.{name}"):
+                return fn(*args, **kwargs)
+        finally:
+            self.metrics.record(name, time.perf_counter() - start)
+
+    def _select(self, name, table, columns, filters=(), order=None, limit=None, cached=True):
+        key = (table, columns, tuple(filters), order, limit)
+        now = time.monotonic()
+        if cached and self.cache_ttl > 0:
+            with self._cache_lock:
+                hit = self._cache.get(key)
+                if hit is not None and now - hit[0] < self.cache_ttl:
+                    self.metrics.record(name + ":cached", 0.0)
+                    return hit[1]
+        rows = self._timed(name, self.backend.select, table, columns, filters, order, limit)
+        if cached and self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache[key] = (now, rows)
+        return rows
+
+    def _upsert(self, name, table, rows, on_conflict):
+        # One round trip; the unique key decides what's a duplicate, so concurrent submits can't race
+        inserted = self._timed(name, self.backend.upsert, table, rows, on_conflict)
+        if inserted:
+            self.invalidate(table)
+            for rollup in ROLLUPS.get(table, ()):
+                self.invalidate(rollup)
+        return inserted
+
+    def insert_batch(self, table, entries):
+        return self._upsert_batch(f"insert_batch:{table}", table, entries, TABLE_KEYS[table])
+
+    def existing_ids(self, table, ids):
+        if not ids:
+            return set()
+        rows = self._select(f"existing_ids:{table}", table, "id", [("id", "in_", list(ids))], cached=False)
+        return {row["id"] for row in rows}
+
+    def _upsert_batch(self, name, table, entries, on_conflict):
+        # Returns (inserted, duplicates); duplicates are the entries whose key already existed
+        inserted = self._upsert(name, table, list(entries), on_conflict) if entries else []
+        keys = {tuple(row[c] for c in on_conflict) for row in inserted}
+        duplicates = [e for e in entries if tuple(e[c] for c in on_conflict) not in keys]
+        return inserted, duplicates
+
+    def invalidate(self, table=None):
+        with self._cache_lock:
+            if table is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == table]:
+                    del self._cache[key]
+
+    def page(self, table, columns, filters=(), cursor=None, limit=PAGE_SIZE):
+        # One keyset page, newest first; pass the last row's page_cursor() to get the next one
+        columns = _with_cursor_columns(columns)
+        return self._timed(f"page:{table}", self.backend.select_page, table, columns, list(filters),
+                           cursor, False, limit)
+
+    def newer_than(self, table, columns, filters=(), cursor=None, limit=None):
+        # Rows added since `cursor` (the session's newest row), newest first
+        columns = _with_cursor_columns(columns)
+        return self._timed(f"newer_than:{table}", self.backend.select_page, table, columns, list(filters),
+                           cursor, True, limit)
+
+    # -- dashboard rollups (maintained by insert triggers, see migrations/003) --
+
+    def status_counts(self, username=None):
+        filters = [("username", "eq", username)] if username else []
+        return self._select("status_counts", "nutrition_status_counts", "username,status,children", filters)
+
+    def child_latest(self, username=None):
+        filters = [("username", "eq", username)] if username else []
+        return self._select("child_latest", "child_latest", "username,name,bmi,arm,whz,status,measured_at", filters,
+                            order=("measured_at", True))
+
+    def daily_intake(self, username=None, since=None):
+        filters = [("username", "eq", username)] if username else []
+        if since:
+            filters.append(("day", "gte", since))
+        return self._select("daily_intake", "daily_intake", "username,name,day,calories,protein,meals", filters,
+                            order=("day", False))
+
+    # -- users --
+
+    def password_hash(self, username):
+        # Stored hash (or legacy plaintext) for auth.authenticate; never cached, so a password change applies at once
+        rows = self._select("password_hash", "users", "username,password", [("username", "eq", username)],
+                            limit=1, cached=False)
+        return rows[0]["password"] if rows else None
+
+    def set_password_hash(self, username, password_hash):
+        self._timed("set_password_hash", self.backend.update, "users", {"password": password_hash},
+                    [("username", "eq", username)])
+
+    def users_with_passwords(self):
+        # For the one-off hash migration in auth.py only
+        return self._select("users_with_passwords", "users", "username,password", cached=False)
+
+    def user_exists(self, username):
+        return len(self._select("user_exists", "users", USER_COLUMNS, [("username", "eq", username)], limit=1)) > 0
+
+    def create_user(self, username, email, password_hash):
+        # False if the username is already taken; hashing is auth.register's job
+        row = {"username": username, "email": email, "password": password_hash}
+        return bool(self._upsert("create_user", "users", row, USER_KEY))
+
+    # -- children --
+
+    def ensure_children(self, children):
+        # Children carry a deterministic id (child_id), so existing ones are simply skipped
+        return self._upsert("ensure_children", "children", list(children), CHILD_KEY) if children else []
+
+    def children(self, username, columns=CHILD_COLUMNS):
+        return self._select("children", "children", columns, [("username", "eq", username)], order=("name", False))
+
+    # -- nutrition_data: one row per measurement, a time series per child --
+
+    def insert_nutrition(self, entry):
+        # False if this child already has a measurement at this time (e.g. a retried submit)
+        return bool(self._upsert("insert_nutrition", "nutrition_data", entry, NUTRITION_KEY))
+
+    def insert_nutrition_batch(self, entries):
+        return self._upsert_batch("insert_nutrition_batch", "nutrition_data", entries, NUTRITION_KEY)
+
+    def nutrition_records(self, username, columns=NUTRITION_COLUMNS):
+        return self._select("nutrition_records", "nutrition_data", columns, [("username", "eq", username)])
+
+    def latest_measurements(self, child_id, n=LATEST_N, columns=SERIES_COLUMNS):
+        # Newest first; served by the (child_id, measured_at) unique index
+        return self._select("latest_measurements", "nutrition_data", columns, [("child_id", "eq", child_id)],
+                            order=("measured_at", True), limit=n)
+
+    def child_series(self, child_id, since=None, columns=SERIES_COLUMNS):
+        # Oldest first, optionally from `since` (ISO timestamp) on
+        filters = [("child_id", "eq", child_id)]
+        if since:
+            filters.append(("measured_at", "gte", since))
+        return self._select("child_series", "nutrition_data", columns, filters, order=("measured_at", False))
+
+    # -- food_data --
+
+    def insert_food(self, entry):
+        # False if this child already has a scan for this meal on that day
+        return bool(self._upsert("insert_food", "food_data", entry, FOOD_KEY))
+
+    def insert_food_batch(self, entries):
+        return self._upsert_batch("insert_food_batch", "food_data", entries, FOOD_KEY)
+
+    def food_records(self, username, columns=FOOD_COLUMNS):
+        return self._select("food_records", "food_data", columns, [("username", "eq", username)])
+
+
+def _with_cursor_columns(columns):
+    names = [c.strip() for c in columns.split(",") if c.strip()]
+    return ",".join(names + [c for c in CURSOR_COLUMNS if c not in names])
+
+
+def page_cursor(row):
+    return (row["created_at"], row["id"]) if row else None
+
+
+_data = None
+_data_lock = threading.Lock()
+
+
+def get_data_access():
+    global _data
+    if _data is None:
+        with _data_lock:
+            if _data is None:
+                _data = DataAccess()
+    return _data
@@ -1,27 +1,91 @@
 import streamlit as st
 from PIL import Image
-import google.generativeai as genai
-import pandas as pd
 from dotenv import load_dotenv
 import os
+import asyncio
+import threading
+from scan_cache import get_scan_cache, StubModel
+from scan_queue import scan_all
+from upload_prep import prepare_upload, timed_generate, timed_stream, upload_log
+from tracing import stage
+from nutrition_table import NUTRITION_PROMPT, EXPECTED_COLUMNS, NUMERIC_COLUMNS, NutritionTableParser, has_table
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+_model = None
+_model_lock = threading.Lock()
 
-# Initialize the Gemini model
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Gemini model, configured on first use (FOOD_SCAN_MODEL=stub answers locally without calling Gemini).
+# google.generativeai is slow to import, so opening the app doesn't pay for it until a scan runs.
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if os.getenv("FOOD_SCAN_MODEL") == "stub":
+                    _model = StubModel()
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                    _model = genai.GenerativeModel('gemini-1.5-flash')
+    return _model
+
+def get_nutrition_response(image, prompt, model=None, cache=None, original_bytes=None):
+    model = model or get_model()
+    cache = cache or get_scan_cache()
+    with stage("food.cache_lookup"):
+        cached = cache.get(image, prompt, model.model_name, validate=has_table)
+    if cached is not None:
+        return cached
+    try:
+        response = timed_generate(model, prepare_upload(image, original_bytes=original_bytes), prompt)
+        # Only answers that parse are cached, so a bad one isn't replayed on every rescan
+        if has_table(response.text):
+            cache.put(image, prompt, model.model_name, response.text)
+        return response.text
+    except Exception as e:
+        st.error(f"⚠ Error: {e}")
+        return None
+
+def stream_nutrition_response(image, prompt, model=None, cache=None, original_bytes=None):
+    # Yields text chunks as Gemini produces them; a cache hit yields the stored answer in one piece
+    model = model or get_model()
+    cache = cache or get_scan_cache()
+    with stage("food.cache_lookup"):
+        cached = cache.get(image, prompt, model.model_name, validate=has_table)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    try:
+        for chunk in timed_stream(model, prepare_upload(image, original_bytes=original_bytes), prompt):
+            chunks.append(chunk)
+            yield chunk
+    except Exception as e:
+        st.error(f"⚠ Error: {e}")
+        return
+    text = "".join(chunks)
+    if has_table(text):
+        cache.put(image, prompt, model.model_name, text)
+
+def _column_config():
+    return {
+        col: st.column_config.NumberColumn(col, format="%.1f") if col in NUMERIC_COLUMNS else st.column_config.TextColumn(col)
+        for col in EXPECTED_COLUMNS
+    }
+
+def show_nutrition_table(df, title="Nutrition Analysis:", container=st):
+    # Display using st.dataframe with fixed header
+    container.subheader(title)
+    container.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=False,
+        column_config=_column_config()
+    )
 
 def run_food_scanner():
-    def get_nutrition_response(image, prompt):
-        try:
-            response = model.generate_content([image, prompt])
-            return response.text
-        except Exception as e:
-            st.error(f"⚠ Error: {e}")
-            return None
 
     # Custom CSS with centered buttons, styled header, and rounded image
     st.markdown("""
@@ -119,6 +183,7 @@ def run_food_scanner():
         st.session_state.show_uploader = False
     if 'uploaded_image' not in st.session_state:
         st.session_state.uploaded_image = None
+        st.session_state.uploaded_size = None
 
     # Upload Image button (green) - Centered
     with st.container():
@@ -138,6 +203,7 @@ def run_food_scanner():
             st.image(image, caption="Uploaded Image", use_column_width=True)
             st.success("Image uploaded successfully!")
             st.session_state.uploaded_image = image
+            st.session_state.uploaded_size = uploaded_file.size
 
     # Show Get Nutrition Quantity button only if image uploaded
     if st.session_state.uploaded_image is not None:
@@ -147,74 +213,55 @@ def run_food_scanner():
             st.markdown('</div></div>', unsafe_allow_html=True)
 
         if get_nutrition_clicked:
-            nutrition_prompt = """
-            Analyze the uploaded image and extract detailed nutritional information for each food item detected, including the quantity of each item.
-            Provide a structured output with the following format:
-
-            Food Item | Quantity | Calories (kcal) | Protein (g) | Carbs (g) | Fats (g) | Vitamins & Minerals
-            -----------|----------|----------------|-------------|-----------|---------|---------------------
-            """
-
-            response = get_nutrition_response(st.session_state.uploaded_image, nutrition_prompt)
-
-            if response:
-                # Split the response into lines
-                lines = response.strip().split("\n")
-                
-                # Define expected columns
-                expected_columns = ["Food Item", "Quantity", "Calories (kcal)", "Protein (g)", "Carbs (g)", "Fats (g)", "Vitamins & Minerals"]
-                
-                # Clean lines: remove all header-like rows and separator lines
-                clean_lines = []
-                header_keywords = ["Food Item", "Quantity", "Calories", "Protein", "Carbs", "Fats", "Vitamins", "Minerals"]
-                
-                for line in lines:
-                    # Skip empty lines or separator lines
-                    if not line.strip() or set(line.strip()).issubset(set('-| ')):
-                        continue
-                    
-                    # Skip lines that contain header keywords
-                    if any(keyword in line for keyword in header_keywords):
-                        continue
-                    
-                    # Only process lines that contain pipe characters (table rows)
-                    if '|' in line:
-                        clean_lines.append(line)
-                
-                # Process the remaining lines
-                if clean_lines:
-                    # Split into rows and clean data
-                    data = []
-                    for line in clean_lines:
-                        parts = [p.strip() for p in line.split('|')]
-                        # Ensure we have at least the main columns (Food Item through Carbs)
-                        if len(parts) >= 5:
-                            # Pad with empty strings if needed
-                            while len(parts) < len(expected_columns):
-                                parts.append("")
-                            data.append(parts[:len(expected_columns)])
-                    
-                    if data:
-                        # Create DataFrame
-                        df = pd.DataFrame(data, columns=expected_columns)
-                        df.index = df.index + 1  # Start index at 1
-                        
-                        # Display using st.dataframe with fixed header
-                        st.subheader("Nutrition Analysis:")
-                        st.dataframe(
-                            df,
-                            use_container_width=True,
-                            hide_index=False,
-                            column_config={col: st.column_config.TextColumn(col) for col in expected_columns}
-                        )
-                        
-                        st.session_state.food_result = df
-                    else:
-                        st.error("⚠ Could not parse nutritional data from response.")
+            uploads_before = upload_log.total
+            parser = NutritionTableParser()
+            received = False
+            table_slot = st.empty()
+            # Rows are parsed and shown as the answer streams in
+            for chunk in stream_nutrition_response(st.session_state.uploaded_image, NUTRITION_PROMPT,
+                                                   original_bytes=st.session_state.uploaded_size):
+                received = True
+                if parser.feed(chunk):
+                    show_nutrition_table(parser.to_frame(), container=table_slot.container())
+            if parser.close():
+                show_nutrition_table(parser.to_frame(), container=table_slot.container())
+            stats = get_scan_cache().stats()
+            st.caption(f"Scan cache: {stats['hits']} hits, {stats['near_hits']} near-duplicate hits, {stats['misses']} misses")
+            last = upload_log.last()
+            if upload_log.total > uploads_before and last['bytes_saved'] is not None:
+                st.caption(f"Upload: {last['bytes_sent'] / 1024:.0f} KB sent ({last['bytes_saved'] / 1024:.0f} KB saved), {last['round_trip_s']:.2f}s round trip")
+
+            if received:
+                df = parser.to_frame()
+                if df is not None:
+                    st.session_state.food_result = df
                 else:
-                    st.error("⚠ No valid data found in the response.")
+                    st.error("⚠ Could not parse nutritional data from response.")
             else:
                 st.error("⚠ Could not retrieve nutritional data. Try again or check the image quality.")
 
+    # Several photos at once: scans run concurrently and each table is shown as soon as it's ready
+    with st.expander("Scan several photos at once"):
+        batch_files = st.file_uploader("Meal photos", type=["jpg", "jpeg", "png"], accept_multiple_files=True, key="batch_uploader")
+        if batch_files and st.button("Scan All", key="batch_scan_button"):
+            images = [Image.open(f) for f in batch_files]
+            progress = st.progress(0.0)
+            done = []
+
+            def on_result(result):
+                done.append(result)
+                progress.progress(len(done) / len(images))
+                name = batch_files[result.index].name
+                if result.error is not None:
+                    st.error(f"⚠ {name}: {result.error}")
+                elif result.table is None:
+                    st.error(f"⚠ {name}: could not parse nutritional data from response.")
+                else:
+                    show_nutrition_table(result.table, title=name)
+
+            results = asyncio.run(scan_all(get_model(), images, on_result=on_result,
+                                           sizes=[f.size for f in batch_files]))
+            st.session_state.food_results = [r.table for r in results]
+
 if __name__ == "__main__":
     run_food_scanner()
@@ -2,23 +2,17 @@
 import streamlit as st
 import cv2
 import numpy as np
-from PIL import Image
-import mediapipe as mp
-from streamlit_image_coordinates import streamlit_image_coordinates
-
-mp_pose = mp.solutions.pose
+from anthropometry import extract_landmarks, landmark_delta, ACCURACY_CHECK
+from image_cache import load_upload
+from calibration import calibrate
+from tracing import traced
+from child_records import save_photo_measurement
+from app_state import tool_state, widget_key, share_measurement
 
 def detect_keypoints(image):
-    with mp_pose.Pose(static_image_mode=True) as pose:
-        results = pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        if results.pose_landmarks:
-            h, w, _ = image.shape
-            landmarks = results.pose_landmarks.landmark
-            head_y = int(landmarks[mp_pose.PoseLandmark.NOSE].y * h)
-            foot_left_y = int(landmarks[mp_pose.PoseLandmark.LEFT_ANKLE].y * h)
-            foot_right_y = int(landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE].y * h)
-            foot_y = max(foot_left_y, foot_right_y)
-            return head_y, foot_y
+    landmarks = extract_landmarks(image)
+    if landmarks is not None:
+        return landmarks.height_points()
     return None, None
 
 def draw_landmarks(image, head_y, foot_y):
@@ -32,52 +26,55 @@ def draw_landmarks(image, head_y, foot_y):
 def get_pixel_distance(p1, p2):
     return np.linalg.norm(np.array(p1) - np.array(p2))
 
-def run_height_estimator():
-    st.markdown("Upload a full-body image **with a visible reference object**, and specify its real-world length.")
-    img_file = st.file_uploader("Upload image", type=["jpg", "jpeg", "png"])
+def run_height_estimator(username=None):
+    # With a username, the estimate can be saved straight into a child's measurement series
+    state = tool_state("height", points=[], result=None)
+    st.markdown("Upload a full-body image **with a visible reference object** (a printed marker or ID card is found "
+                "automatically), and specify its real-world length.")
+    img_file = st.file_uploader("Upload image", type=["jpg", "jpeg", "png"], key=widget_key("height", "upload"))
 
     if img_file:
-        image = Image.open(img_file).convert("RGB")
-        img_np = np.array(image)
-        image_copy = img_np.copy()
-
-        reference_length = st.number_input("Enter the real-world length of the reference object (in cm)", min_value=1.0, step=0.5)
-
-        st.subheader("Step 1: Click two points on the reference object")
-
-        if "points" not in st.session_state:
-            st.session_state.points = []
-
-        for i, (x, y) in enumerate(st.session_state.points):
-            cv2.circle(image_copy, (x, y), 8, (0, 0, 255), -1)
-            cv2.putText(image_copy, f"P{i+1}", (x+10, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-
-        coords = streamlit_image_coordinates(Image.fromarray(image_copy), key="click_img")
-
-        if coords and len(st.session_state.points) < 2:
-            st.session_state.points.append((int(coords['x']), int(coords['y'])))
-
-        if st.button("🔄 Reset Points"):
-            st.session_state.points = []
-
-        if len(st.session_state.points) == 2:
-            x1, y1 = st.session_state.points[0]
-            x2, y2 = st.session_state.points[1]
-            pixel_dist = get_pixel_distance((x1, y1), (x2, y2))
-            calibration_factor = reference_length / pixel_dist
-            st.success(f"Calibration: {calibration_factor:.4f} cm/pixel")
-
-            st.subheader("Step 2: Estimating height from landmarks")
-            image_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-            head_y, foot_y = detect_keypoints(image_bgr)
-
-            if head_y is not None and foot_y is not None:
-                pixel_height = abs(foot_y - head_y)
-                estimated_height = calibration_factor * pixel_height
-                annotated_img = draw_landmarks(image_bgr, head_y, foot_y)
-                st.image(annotated_img, caption="Estimated Height", channels="BGR")
-                st.success(f"Estimated Height: **{estimated_height:.2f} cm**")
-                return round(estimated_height, 2)
-            else:
-                st.error("❌ Could not detect landmarks. Try another image.")
-    return None
+        entry = load_upload(img_file)
+        if state.get("digest") != entry.digest:
+            state.update(digest=entry.digest, points=[], last_click=None, result=None)
+
+        reference_length = st.number_input("Enter the real-world length of the reference object (in cm)", min_value=1.0, step=0.5,
+                                           key=widget_key("height", "reference"))
+        measure_height(entry, reference_length, state, username)
+    return state["result"]
+
+@st.fragment
+@traced("height.measure")
+def measure_height(entry, reference_length, state, username=None):
+    # Calibration clicks rerun only this fragment, not the upload, decode and page around it
+    st.subheader("Step 1: Calibrate from the reference object")
+    calibration_factor = calibrate(entry, reference_length, state, "height")
+
+    if calibration_factor:
+        st.success(f"Calibration: {calibration_factor:.4f} cm/pixel")
+
+        st.subheader("Step 2: Estimating height from landmarks")
+        landmarks = entry.landmarks()
+
+        if landmarks is not None:
+            head_y, foot_y = landmarks.height_points()
+            pixel_height = abs(foot_y - head_y)
+            estimated_height = calibration_factor * pixel_height
+            scale = entry.display_scale
+            annotated_img = draw_landmarks(entry.thumb_bgr, int(head_y * scale), int(foot_y * scale))
+            st.image(annotated_img, caption="Estimated Height", channels="BGR")
+            st.success(f"Estimated Height: **{estimated_height:.2f} cm**")
+            if ACCURACY_CHECK:
+                full = entry.landmarks(full_res=True)
+                if full is not None:
+                    full_head_y, full_foot_y = full.height_points()
+                    full_height = calibration_factor * abs(full_foot_y - full_head_y)
+                    st.caption(f"Full-res check: {full_height:.2f} cm "
+                               f"(Δ {estimated_height - full_height:+.2f} cm, max landmark shift {landmark_delta(landmarks, full):.1f}px)")
+            state["result"] = round(estimated_height, 2)
+            share_measurement("height", state["result"])
+            st.caption("Height filled in on the Nutrition Input page.")
+            if username:
+                save_photo_measurement(username, "height", height=state["result"])
+        else:
+            st.error("❌ Could not detect landmarks. Try another image.")
@@ -0,0 +1,163 @@
+# image_cache.py
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from anthropometry import extract_landmarks, fit_within
+from tracing import stage
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+MB = 1024 * 1024
+GLOBAL_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_MB", 512)) * MB
+SESSION_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_SESSION_MB", 128)) * MB
+DISPLAY_MAX_SIDE = int(os.getenv("DISPLAY_MAX_SIDE", 1024))
+
+_NO_LANDMARKS = object()
+
+
+class DecodedImage:
+    # Read-only full-res RGB plus a display thumbnail for one upload, and its pose record once computed
+    __slots__ = ("digest", "rgb", "thumb_rgb", "thumb_bgr", "display_scale", "_landmarks")
+
+    def __init__(self, digest, rgb):
+        self.digest = digest
+        self.rgb = rgb
+        with stage("image.thumbnail"):
+            self.thumb_rgb, self.display_scale = fit_within(rgb, DISPLAY_MAX_SIDE)
+            self.thumb_bgr = cv2.cvtColor(self.thumb_rgb, cv2.COLOR_RGB2BGR)
+        self.rgb.setflags(write=False)
+        self.thumb_rgb.setflags(write=False)
+        self.thumb_bgr.setflags(write=False)
+        self._landmarks = _NO_LANDMARKS
+
+    @property
+    def bgr(self):
+        # Not kept in the cache; a 50 MP photo would double its footprint
+        return cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR)
+
+    @property
+    def nbytes(self):
+        thumb = self.thumb_rgb.nbytes if self.thumb_rgb is not self.rgb else 0
+        return self.rgb.nbytes + thumb + self.thumb_bgr.nbytes
+
+    def to_full(self, x, y):
+        return int(round(x / self.display_scale)), int(round(y / self.display_scale))
+
+    def to_display(self, x, y):
+        return int(round(x * self.display_scale)), int(round(y * self.display_scale))
+
+    def landmarks(self, full_res=False):
+        if full_res:
+            return extract_landmarks(None, digest=self.digest, rgb=self.rgb, max_side=0)
+        if self._landmarks is _NO_LANDMARKS:
+            self._landmarks = extract_landmarks(None, digest=self.digest, rgb=self.rgb)
+        return self._landmarks
+
+
+class ImageCache:
+    def __init__(self, max_bytes=GLOBAL_CACHE_BYTES, session_max_bytes=SESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.session_max_bytes = session_max_bytes
+        self._entries = OrderedDict()
+        self._owners = {}
+        self._sessions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, data, session_id="default"):
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self._touch(session_id, entry)
+                return entry
+        # Decode outside the lock so one large upload doesn't stall other sessions
+        with stage("image.decode"):
+            rgb = np.array(Image.open(io.BytesIO(data)).convert("RGB"))
+        entry = DecodedImage(digest, rgb)
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = entry
+                self._bytes += entry.nbytes
+            entry = self._entries[digest]
+            self._touch(session_id, entry)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def _touch(self, session_id, entry):
+        owned = self._sessions.setdefault(session_id, OrderedDict())
+        owned[entry.digest] = entry.nbytes
+        owned.move_to_end(entry.digest)
+        self._owners.setdefault(entry.digest, set()).add(session_id)
+        while sum(owned.values()) > self.session_max_bytes and len(owned) > 1:
+            digest, _ = owned.popitem(last=False)
+            owners = self._owners.get(digest, set())
+            owners.discard(session_id)
+            if not owners:
+                self._drop(digest)
+
+    def _drop(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+        for session_id in self._owners.pop(digest, ()):
+            self._sessions.get(session_id, {}).pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._sessions.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+
+_cache = ImageCache()
+
+
+def _session_id():
+    if get_script_run_ctx is not None:
+        ctx = get_script_run_ctx()
+        if ctx is not None:
+            return ctx.session_id
+    return "default"
+
+
+def load_upload(uploaded_file):
+    return _cache.get(uploaded_file.getvalue(), _session_id())
+
+
+def draw_click_point(canvas, i, x, y):
+    cv2.circle(canvas, (x, y), 8, (0, 0, 255), -1)
+    cv2.putText(canvas, f"P{i+1}", (x+10, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+
+
+def click_overlay(entry, points, state, key):
+    # Redraw only the points added since the last rerun; a reset or new upload starts from the base image.
+    # Points are full-res coordinates and are drawn onto the display thumbnail.
+    points = [tuple(p) for p in points]
+    cached = state.get(key)
+    if cached is None or cached["digest"] != entry.digest or cached["points"] != points[:len(cached["points"])]:
+        cached = {"digest": entry.digest, "points": [], "canvas": entry.thumb_rgb.copy(), "image": None}
+        state[key] = cached
+    if cached["image"] is None or len(points) > len(cached["points"]):
+        for i in range(len(cached["points"]), len(points)):
+            draw_click_point(cached["canvas"], i, *entry.to_display(*points[i]))
+        cached["points"] = points
+        cached["image"] = Image.fromarray(cached["canvas"])
+    return cached["image"]
@@ -0,0 +1,32 @@
+-- 001_unique_keys.sql
+-- Unique keys behind the single-round-trip upserts in data_access.py
+-- (on_conflict=username / username,name,meal_time; nutrition_data is keyed in 004).
+-- Run once in the Supabase SQL editor. Existing duplicates are removed first, keeping the oldest row.
+
+begin;
+
+-- users: one account per username
+delete from users a using users b
+ where a.username = b.username and a.ctid > b.ctid;
+alter table users
+  add constraint users_username_key unique (username);
+
+-- nutrition_data: repeat visits for the same child are history, not duplicates, so nothing is
+-- deleted here. Its key, (child_id, measured_at), comes with the measurement series in 004.
+alter table nutrition_data
+  add column if not exists created_at timestamptz not null default now();
+
+-- food_data: one scan per (username, child name, meal time); 005 adds the meal date to this key
+alter table food_data
+  add column if not exists created_at timestamptz not null default now();
+delete from food_data a using food_data b
+ where a.username = b.username and a.name = b.name and a.meal_time = b.meal_time
+   and (a.created_at, a.ctid) > (b.created_at, b.ctid);
+alter table food_data
+  add constraint food_data_username_name_meal_time_key unique (username, name, meal_time);
+
+-- The unique constraints index the key columns; these cover the per-user listings
+create index if not exists nutrition_data_username_created_at_idx on nutrition_data (username, created_at desc);
+create index if not exists food_data_username_created_at_idx on food_data (username, created_at desc);
+
+commit;
@@ -0,0 +1,18 @@
+-- 002_growth_zscores.sql
+-- Columns for WHO growth-standard z-scores (zscore.py) on nutrition_data.
+-- sex: 1 = male, 2 = female (WHO coding); age_months drives the age-indexed indicators.
+
+begin;
+
+alter table nutrition_data
+  add column if not exists sex smallint check (sex in (1, 2)),
+  add column if not exists age_months real,
+  add column if not exists waz real,  -- weight-for-age
+  add column if not exists haz real,  -- height-for-age
+  add column if not exists whz real,  -- weight-for-length/height
+  add column if not exists baz real;  -- BMI-for-age
+
+-- Screening lists pull the most wasted children first
+create index if not exists nutrition_data_username_whz_idx on nutrition_data (username, whz) where whz is not null;
+
+commit;
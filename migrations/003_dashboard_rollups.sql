@@ -0,0 +1,117 @@
+-- 003_dashboard_rollups.sql
+-- Rollup tables for the supervisor dashboard. Triggers keep them current on every insert,
+-- so dashboard reads touch a handful of rows however long the history gets.
+--   child_latest             latest BMI / MUAC / status per (username, child)
+--   nutrition_status_counts  children per (username, status), by each child's latest status
+--   daily_intake             calories / protein per (username, child, day) from food_data.nutrition_table
+-- refresh_dashboard_rollups() rebuilds all three from scratch, e.g. after deleting or editing rows.
+
+begin;
+
+create table if not exists child_latest (
+  username    text not null,
+  name        text not null,
+  bmi         real,
+  arm         real,
+  whz         real,
+  status      text,
+  measured_at timestamptz not null,
+  primary key (username, name)
+);
+
+create table if not exists nutrition_status_counts (
+  username text not null,
+  status   text not null,
+  children integer not null default 0,
+  primary key (username, status)
+);
+
+create table if not exists daily_intake (
+  username text not null,
+  name     text not null,
+  day      date not null,
+  calories numeric not null default 0,
+  protein  numeric not null default 0,
+  meals    integer not null default 0,
+  primary key (username, name, day)
+);
+
+create or replace function rollup_nutrition_insert() returns trigger
+language plpgsql as $$
+declare
+  prev child_latest%rowtype;
+begin
+  select * into prev from child_latest
+   where username = new.username and name = new.name
+   for update;
+
+  if found then
+    -- An older measurement arriving late (e.g. from the offline outbox) doesn't move the rollups
+    if prev.measured_at > new.created_at then
+      return new;
+    end if;
+    update child_latest
+       set bmi = new.bmi, arm = new.arm, whz = new.whz, status = new.status, measured_at = new.created_at
+     where username = new.username and name = new.name;
+    update nutrition_status_counts set children = children - 1
+     where username = new.username and status = prev.status;
+  else
+    insert into child_latest (username, name, bmi, arm, whz, status, measured_at)
+    values (new.username, new.name, new.bmi, new.arm, new.whz, new.status, new.created_at);
+  end if;
+
+  insert into nutrition_status_counts (username, status, children)
+  values (new.username, new.status, 1)
+  on conflict (username, status) do update set children = nutrition_status_counts.children + 1;
+  return new;
+end $$;
+
+create or replace function rollup_food_insert() returns trigger
+language plpgsql as $$
+begin
+  insert into daily_intake (username, name, day, calories, protein, meals)
+  values (
+    new.username, new.name, new.created_at::date,
+    coalesce((new.nutrition_table ->> 'calories')::numeric, 0),
+    coalesce((new.nutrition_table ->> 'protein')::numeric, 0),
+    1
+  )
+  on conflict (username, name, day) do update
+     set calories = daily_intake.calories + excluded.calories,
+         protein  = daily_intake.protein + excluded.protein,
+         meals    = daily_intake.meals + 1;
+  return new;
+end $$;
+
+drop trigger if exists nutrition_data_rollup on nutrition_data;
+create trigger nutrition_data_rollup after insert on nutrition_data
+  for each row execute function rollup_nutrition_insert();
+
+drop trigger if exists food_data_rollup on food_data;
+create trigger food_data_rollup after insert on food_data
+  for each row execute function rollup_food_insert();
+
+create or replace function refresh_dashboard_rollups() returns void
+language sql as $$
+  truncate child_latest, nutrition_status_counts, daily_intake;
+
+  insert into child_latest (username, name, bmi, arm, whz, status, measured_at)
+  select distinct on (username, name) username, name, bmi, arm, whz, status, created_at
+    from nutrition_data
+   order by username, name, created_at desc;
+
+  insert into nutrition_status_counts (username, status, children)
+  select username, status, count(*) from child_latest group by username, status;
+
+  insert into daily_intake (username, name, day, calories, protein, meals)
+  select username, name, created_at::date,
+         sum(coalesce((nutrition_table ->> 'calories')::numeric, 0)),
+         sum(coalesce((nutrition_table ->> 'protein')::numeric, 0)),
+         count(*)
+    from food_data
+   group by username, name, created_at::date;
+$$;
+
+select refresh_dashboard_rollups();
+
+commit;
@@ -0,0 +1,111 @@
+-- 004_child_series.sql
+-- Turns nutrition_data into an append-only measurement series per child.
+--   children: one row per (username, child name) with a stable id. The id is
+--     uuid5(CHILD_NAMESPACE, username || '/' || name), so the app (data_access.child_id) and this
+--     backfill derive the same id without a round trip, offline included.
+--   nutrition_data: one row per visit or photo measurement, keyed by (child_id, measured_at).
+--     This is the table's only key. Databases that ran an earlier 001, which kept one row per
+--     (username, name), have that constraint dropped here.
+-- The dashboard rollup trigger from 003 is redefined to order by measured_at and to ignore
+-- partial photo measurements (no weight, so no status).
+
+begin;
+
+create extension if not exists "uuid-ossp";
+
+create table if not exists children (
+  id         uuid primary key,
+  username   text not null,
+  name       text not null,
+  sex        smallint check (sex in (1, 2)),
+  created_at timestamptz not null default now(),
+  unique (username, name)
+);
+
+alter table nutrition_data
+  add column if not exists child_id    uuid references children (id),
+  add column if not exists measured_at timestamptz,
+  add column if not exists source      text not null default 'manual' check (source in ('manual', 'photo'));
+
+insert into children (id, username, name, sex)
+select distinct on (username, name)
+       uuid_generate_v5('ffc8e9f0-70ac-4135-8f43-cf507fb8e869', username || '/' || name), username, name, sex
+  from nutrition_data
+ order by username, name, created_at desc
+    on conflict do nothing;
+
+update nutrition_data
+   set child_id = uuid_generate_v5('ffc8e9f0-70ac-4135-8f43-cf507fb8e869', username || '/' || name),
+       measured_at = coalesce(measured_at, created_at)
+ where child_id is null or measured_at is null;
+
+alter table nutrition_data
+  alter column child_id set not null,
+  alter column measured_at set not null,
+  alter column measured_at set default now();
+
+alter table nutrition_data drop constraint if exists nutrition_data_username_name_key;
+-- Upsert key for new measurements, and the index behind latest-N / velocity reads
+alter table nutrition_data
+  add constraint nutrition_data_child_id_measured_at_key unique (child_id, measured_at);
+
+create index if not exists children_username_idx on children (username, name);
+
+create or replace function rollup_nutrition_insert() returns trigger
+language plpgsql as $$
+declare
+  prev child_latest%rowtype;
+begin
+  if new.status is null then
+    return new;
+  end if;
+
+  select * into prev from child_latest
+   where username = new.username and name = new.name
+   for update;
+
+  if found then
+    if prev.measured_at > new.measured_at then
+      return new;
+    end if;
+    update child_latest
+       set bmi = new.bmi, arm = new.arm, whz = new.whz, status = new.status, measured_at = new.measured_at
+     where username = new.username and name = new.name;
+    update nutrition_status_counts set children = children - 1
+     where username = new.username and status = prev.status;
+  else
+    insert into child_latest (username, name, bmi, arm, whz, status, measured_at)
+    values (new.username, new.name, new.bmi, new.arm, new.whz, new.status, new.measured_at);
+  end if;
+
+  insert into nutrition_status_counts (username, status, children)
+  values (new.username, new.status, 1)
+  on conflict (username, status) do update set children = nutrition_status_counts.children + 1;
+  return new;
+end $$;
+
+create or replace function refresh_dashboard_rollups() returns void
+language sql as $$
+  truncate child_latest, nutrition_status_counts, daily_intake;
+
+  insert into child_latest (username, name, bmi, arm, whz, status, measured_at)
+  select distinct on (username, name) username, name, bmi, arm, whz, status, measured_at
+    from nutrition_data
+   where status is not null
+   order by username, name, measured_at desc;
+
+  insert into nutrition_status_counts (username, status, children)
+  select username, status, count(*) from child_latest group by username, status;
+
+  insert into daily_intake (username, name, day, calories, protein, meals)
+  select username, name, created_at::date,
+         sum(coalesce((nutrition_table ->> 'calories')::numeric, 0)),
+         sum(coalesce((nutrition_table ->> 'protein')::numeric, 0)),
+         count(*)
+    from food_data
+   group by username, name, created_at::date;
+$$;
+
+select refresh_dashboard_rollups();
+
+commit;
@@ -0,0 +1,63 @@
+-- 005_food_meal_date.sql
+-- food_data was unique on (username, name, meal_time) with no date, so each child could log each
+-- meal time once ever. Scans now carry the day the meal was eaten (meal_date, set by the app when
+-- the entry is made, offline included) and the key is (username, name, meal_date, meal_time), as
+-- 004 did for nutrition_data. The daily intake rollup groups by meal_date instead of sync time.
+
+begin;
+
+alter table food_data
+  add column if not exists meal_date date;
+
+update food_data set meal_date = created_at::date where meal_date is null;
+
+alter table food_data
+  alter column meal_date set not null,
+  alter column meal_date set default current_date;
+
+alter table food_data drop constraint if exists food_data_username_name_meal_time_key;
+alter table food_data
+  add constraint food_data_username_name_meal_date_meal_time_key unique (username, name, meal_date, meal_time);
+
+create or replace function rollup_food_insert() returns trigger
+language plpgsql as $$
+begin
+  insert into daily_intake (username, name, day, calories, protein, meals)
+  values (
+    new.username, new.name, new.meal_date,
+    coalesce((new.nutrition_table ->> 'calories')::numeric, 0),
+    coalesce((new.nutrition_table ->> 'protein')::numeric, 0),
+    1
+  )
+  on conflict (username, name, day) do update
+     set calories = daily_intake.calories + excluded.calories,
+         protein  = daily_intake.protein + excluded.protein,
+         meals    = daily_intake.meals + 1;
+  return new;
+end $$;
+
+create or replace function refresh_dashboard_rollups() returns void
+language sql as $$
+  truncate child_latest, nutrition_status_counts, daily_intake;
+
+  insert into child_latest (username, name, bmi, arm, whz, status, measured_at)
+  select distinct on (username, name) username, name, bmi, arm, whz, status, measured_at
+    from nutrition_data
+   where status is not null
+   order by username, name, measured_at desc;
+
+  insert into nutrition_status_counts (username, status, children)
+  select username, status, count(*) from child_latest group by username, status;
+
+  insert into daily_intake (username, name, day, calories, protein, meals)
+  select username, name, meal_date,
+         sum(coalesce((nutrition_table ->> 'calories')::numeric, 0)),
+         sum(coalesce((nutrition_table ->> 'protein')::numeric, 0)),
+         count(*)
+    from food_data
+   group by username, name, meal_date;
+$$;
+
+select refresh_dashboard_rollups();
+
+commit;
@@ -0,0 +1,72 @@
+# nutrition.py
+import numpy as np
+import pandas as pd
+
+# Upper bounds of each band; a value equal to a cut-off falls in the band above it
+BMI_CUTS = [16, 17, 18.5, 25]
+BMI_LABELS = ["Severe Malnutrition", "Moderate Malnutrition", "Mild Malnutrition", "Normal", "Overweight"]
+MUAC_CUTS = [12.5, 13.5]
+MUAC_LABELS = ["Severe Acute Malnutrition", "Moderate Acute Malnutrition", "Normal Nutrition Status"]
+
+# Nutrition status logic
+def get_status(bmi):
+    if bmi < 16:
+        return "Severe Malnutrition"
+    elif bmi < 17:
+        return "Moderate Malnutrition"
+    elif bmi < 18.5:
+        return "Mild Malnutrition"
+    elif bmi < 25:
+        return "Normal"
+    else:
+        return "Overweight"
+
+
+def get_muac_status(muac_cm):
+    if muac_cm < 12.5:
+        return "Severe Acute Malnutrition"
+    elif muac_cm < 13.5:
+        return "Moderate Acute Malnutrition"
+    else:
+        return "Normal Nutrition Status"
+
+
+def compute_bmi(weight, height_cm):
+    height_m = height_cm / 100
+    return weight / (height_m ** 2)
+
+
+def bmi_array(weight, height_cm):
+    weight = np.asarray(weight, dtype=np.float64)
+    height_m = np.asarray(height_cm, dtype=np.float64) / 100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = weight / (height_m * height_m)
+    bmi[~np.isfinite(bmi) | (height_m <= 0)] = np.nan
+    return bmi
+
+
+def _band(values, cuts, labels):
+    # searchsorted(side="right") reproduces the scalar `<` comparisons; NaN stays missing
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.searchsorted(cuts, values, side="right")
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def status_array(bmi):
+    return _band(bmi, BMI_CUTS, BMI_LABELS)
+
+
+def muac_status_array(muac_cm):
+    return _band(muac_cm, MUAC_CUTS, MUAC_LABELS)
+
+
+def classify_frame(df, weight="weight", height="height", arm="arm"):
+    # Adds bmi, status and muac_status columns for every row in one pass
+    out = df.copy()
+    bmi = bmi_array(df[weight].to_numpy(), df[height].to_numpy())
+    out["bmi"] = np.round(bmi, 2)
+    out["status"] = status_array(bmi)
+    if arm in df:
+        out["muac_status"] = muac_status_array(df[arm].to_numpy())
+    return out
@@ -0,0 +1,138 @@
+# nutrition_table.py
+# Single-pass parser for the pipe table Gemini returns for a food scan. It accepts the response
+# in arbitrary chunks (generate_content(stream=True)), so rows can be shown as they arrive.
+import math
+import re
+
+import pandas as pd
+
+from tracing import traced
+
+NUTRITION_PROMPT = """
+            Analyze the uploaded image and extract detailed nutritional information for each food item detected, including the quantity of each item.
+            Provide a structured output with the following format:
+
+            Food Item | Quantity | Calories (kcal) | Protein (g) | Carbs (g) | Fats (g) | Vitamins & Minerals
+            -----------|----------|----------------|-------------|-----------|---------|---------------------
+            """
+
+# Define expected columns
+EXPECTED_COLUMNS = ["Food Item", "Quantity", "Calories (kcal)", "Protein (g)", "Carbs (g)", "Fats (g)", "Vitamins & Minerals"]
+NUMERIC_COLUMNS = ["Calories (kcal)", "Protein (g)", "Carbs (g)", "Fats (g)"]
+
+# Header cells are matched on their leading word, so "Fat (g)" or "Calories" still line up
+_HEADER_ALIASES = {
+    "food": "Food Item", "item": "Food Item",
+    "quantity": "Quantity", "portion": "Quantity", "serving": "Quantity",
+    "calories": "Calories (kcal)", "energy": "Calories (kcal)", "kcal": "Calories (kcal)",
+    "protein": "Protein (g)", "proteins": "Protein (g)",
+    "carbs": "Carbs (g)", "carbohydrates": "Carbs (g)", "carbohydrate": "Carbs (g)",
+    "fats": "Fats (g)", "fat": "Fats (g)",
+    "vitamins": "Vitamins & Minerals", "micronutrients": "Vitamins & Minerals",
+}
+
+_SEPARATOR = re.compile(r"^[\s|:\-]+$")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_MIN_CELLS = 5  # at least Food Item through Carbs
+
+
+def split_row(line):
+    return [c.strip().strip("*").strip() for c in line.strip().strip("|").split("|")]
+
+
+def to_number(cell):
+    # "~250 kcal" -> 250.0, "10-12 g" -> 11.0 (midpoint), "<1g" -> 1.0, "N/A" -> nan
+    numbers = _NUMBER.findall(cell.replace(",", ""))
+    if not numbers:
+        return math.nan
+    if len(numbers) >= 2 and re.search(r"\d\s*(?:-|–|to)\s*\d", cell):
+        return (float(numbers[0]) + float(numbers[1])) / 2
+    return float(numbers[0])
+
+
+def _header_mapping(cells):
+    mapping = []
+    for cell in cells:
+        words = re.findall(r"[a-z]+", cell.lower())
+        mapping.append(_HEADER_ALIASES.get(words[0]) if words else None)
+    # Treat it as the header only if it names the food column and at least two numeric ones
+    names = set(filter(None, mapping))
+    if "Food Item" in names and len(names & set(NUMERIC_COLUMNS)) >= 2:
+        return mapping
+    return None
+
+
+class NutritionTableParser:
+    def __init__(self):
+        self.rows = []
+        self._buffer = ""
+        self._mapping = None
+        self._header = None
+
+    def feed(self, chunk):
+        # Returns the rows completed by this chunk
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        return [row for row in map(self._parse_line, lines) if row is not None]
+
+    def close(self):
+        line, self._buffer = self._buffer, ""
+        row = self._parse_line(line)
+        return [row] if row is not None else []
+
+    def _parse_line(self, line):
+        if "|" not in line or _SEPARATOR.match(line):
+            return None
+        cells = split_row(line)
+        if self._mapping is None:
+            mapping = _header_mapping(cells)
+            if mapping is not None:
+                self._mapping, self._header = mapping, cells
+                return None
+        elif cells == self._header:
+            # Long answers sometimes repeat the header; after the first one it's a plain comparison
+            return None
+        if len(cells) < _MIN_CELLS:
+            return None
+
+        row = dict.fromkeys(EXPECTED_COLUMNS, "")
+        if self._mapping is None:
+            pairs = zip(EXPECTED_COLUMNS, cells)
+        else:
+            pairs = ((col, cell) for col, cell in zip(self._mapping, cells) if col is not None)
+        for col, cell in pairs:
+            row[col] = cell
+        if not row["Food Item"]:
+            return None
+        for col in NUMERIC_COLUMNS:
+            row[col] = to_number(row[col])
+        self.rows.append(row)
+        return row
+
+    def to_frame(self):
+        return rows_to_frame(self.rows)
+
+
+def rows_to_frame(rows):
+    if not rows:
+        return None
+    df = pd.DataFrame(rows, columns=EXPECTED_COLUMNS)
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].astype("float64")
+    df.index = df.index + 1  # Start index at 1
+    return df
+
+
+@traced("table.parse")
+def parse_nutrition_table(response):
+    parser = NutritionTableParser()
+    parser.feed(response)
+    parser.close()
+    return parser.to_frame()
+
+
+def has_table(response):
+    # Whether a response holds at least one table row; what the scan cache accepts
+    parser = NutritionTableParser()
+    parser.feed(response)
+    parser.close()
+    return bool(parser.rows)
@@ -0,0 +1,266 @@
+# offline_queue.py
+# Durable outbox for field use. Entries are written to a local SQLite journal (WAL) the moment
+# they're submitted, and a background syncer pushes them to the data layer in batches.
+# Entries carry the uuid4 id the app already generates, so a batch that is retried after a
+# dropped connection can't be inserted twice. Failures are sorted by cause:
+#   transport  no connection or a timeout: the batch backs off and is retried for as long as it
+#              takes; being offline never costs an entry
+#   server     5xx / 408 / 429: retried with backoff, then set aside as failed after
+#              OFFLINE_MAX_ATTEMPTS; failed entries are kept and can be retried from the sidebar
+#   anything   else is about the row itself (constraint, bad column, PostgREST PGRST errors). The
+#              batch is resent row by row so the others still sync, and that row alone becomes a
+#              conflict with its error
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from data_access import get_data_access, SYNC_ORDER
+
+OUTBOX_PATH = os.getenv("OFFLINE_QUEUE_PATH", os.path.join(".cache", "outbox.sqlite3"))
+SYNC_INTERVAL = float(os.getenv("OFFLINE_SYNC_INTERVAL", 30))
+SYNC_BATCH_SIZE = int(os.getenv("OFFLINE_SYNC_BATCH_SIZE", 100))
+MAX_ATTEMPTS = int(os.getenv("OFFLINE_MAX_ATTEMPTS", 8))
+MAX_BACKOFF = 15 * 60
+
+PENDING, SYNCED, CONFLICT, FAILED = "pending", "synced", "conflict", "failed"
+TRANSPORT, SERVER, PERMANENT = "transport", "server", "permanent"
+# httpx / httpcore / requests transport failures, matched by class name so neither is imported here
+TRANSPORT_ERRORS = {"TransportError", "TimeoutException", "NetworkError", "ConnectError", "ConnectTimeout",
+                    "ReadTimeout", "RemoteProtocolError", "ConnectionError", "Timeout"}
+RETRY_STATUSES = (408, 429)
+
+
+def classify_error(error):
+    # TRANSPORT, SERVER or PERMANENT; only the first two are worth retrying
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return TRANSPORT
+    if any(cls.__name__ in TRANSPORT_ERRORS for cls in type(error).__mro__):
+        return TRANSPORT
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and (status >= 500 or status in RETRY_STATUSES):
+        return SERVER
+    return PERMANENT
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id TEXT PRIMARY KEY, tbl TEXT NOT NULL, payload TEXT NOT NULL, username TEXT,"
+            " state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL DEFAULT 0, last_error TEXT,"
+            " created REAL NOT NULL, synced REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        if "username" not in columns:
+            # Journals from before entries were tagged with their worker
+            self._db.execute("ALTER TABLE outbox ADD COLUMN username TEXT")
+            self._db.execute("UPDATE outbox SET username = json_extract(payload, '$.username')")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_state_idx ON outbox (state, next_attempt)")
+        self._lock = threading.Lock()
+
+    def enqueue(self, table, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (id, tbl, payload, username, created) VALUES (?, ?, ?, ?, ?)",
+                (entry["id"], table, json.dumps(entry), entry.get("username"), time.time()),
+            )
+        return entry["id"]
+
+    def due(self, table, limit, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE state = ? AND tbl = ? AND next_attempt <= ?"
+                " ORDER BY created LIMIT ?",
+                (PENDING, table, now, limit),
+            ).fetchall()
+        return [(id_, json.loads(payload), attempts) for id_, payload, attempts in rows]
+
+    def pending_tables(self):
+        with self._lock:
+            return [t for (t,) in self._db.execute("SELECT DISTINCT tbl FROM outbox WHERE state = ?", (PENDING,))]
+
+    def mark(self, ids, state, error=None):
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET state = ?, last_error = ?, synced = ? WHERE id = ?",
+                [(state, error, time.time(), id_) for id_ in ids],
+            )
+
+    def mark_failed(self, ids, error, limited=True):
+        # Exponential backoff per entry: 2, 4, 8 ... seconds, capped at MAX_BACKOFF. With `limited`,
+        # the last allowed attempt sets the entry aside as failed; transport errors are never limited.
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?,"
+                " state = CASE WHEN ? AND attempts + 1 >= ? THEN ? ELSE state END,"
+                " next_attempt = ? + min(?, 1 << min(attempts + 1, 20)) WHERE id = ?",
+                [(error, limited, MAX_ATTEMPTS, FAILED, now, MAX_BACKOFF, id_) for id_ in ids],
+            )
+
+    def retry_failed(self, username=None):
+        # Back into the queue with a fresh attempt budget
+        where, args = ("AND username = ?", (username,)) if username is not None else ("", ())
+        with self._lock:
+            self._db.execute(
+                f"UPDATE outbox SET state = ?, attempts = 0, next_attempt = 0 WHERE state = ? {where}",
+                (PENDING, FAILED) + args,
+            )
+
+    def counts(self, username=None):
+        # Per worker when a username is given; the sidebar must not show other workers' entries
+        where, args = ("WHERE username = ?", (username,)) if username is not None else ("", ())
+        with self._lock:
+            rows = self._db.execute(f"SELECT state, COUNT(*) FROM outbox {where} GROUP BY state", args).fetchall()
+        counts = {PENDING: 0, SYNCED: 0, CONFLICT: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def entries(self, state, username=None):
+        # Entries in one state with their last error, oldest first
+        where, args = ("AND username = ?", (username,)) if username is not None else ("", ())
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT tbl, payload, last_error FROM outbox WHERE state = ? {where} ORDER BY created",
+                (state,) + args,
+            ).fetchall()
+        return [{"table": t, "entry": json.loads(p), "reason": r} for t, p, r in rows]
+
+    def conflicts(self, username=None):
+        # Entries the server will never accept as they are: duplicates and rejected rows
+        return self.entries(CONFLICT, username)
+
+    def failed(self, username=None):
+        # Entries that ran out of attempts on server errors; kept until retried
+        return self.entries(FAILED, username)
+
+    def dismiss_conflicts(self, username=None):
+        # Conflicts only; failed entries are still data waiting to be sent
+        where, args = ("AND username = ?", (username,)) if username is not None else ("", ())
+        with self._lock:
+            self._db.execute(f"DELETE FROM outbox WHERE state = ? {where}", (CONFLICT,) + args)
+
+    def prune_synced(self, older_than=7 * 24 * 3600):
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE state = ? AND synced < ?", (SYNCED, time.time() - older_than))
+
+
+def flush(outbox, data=None, batch_size=SYNC_BATCH_SIZE):
+    # Push everything that's due; returns {"synced": n, "conflicts": n, "failed": n}
+    data = data or get_data_access()
+    result = {"synced": 0, "conflicts": 0, "failed": 0}
+    # Children before their measurements, so a child registered offline exists when its rows arrive
+    tables = sorted(outbox.pending_tables(), key=lambda t: SYNC_ORDER.index(t) if t in SYNC_ORDER else len(SYNC_ORDER))
+    for table in tables:
+        while True:
+            batch = outbox.due(table, batch_size)
+            if not batch:
+                break
+            error = _send(outbox, data, table, batch, result)
+            if error is not None and classify_error(error) == PERMANENT and len(batch) > 1:
+                # Something in the rows: resend them one at a time so only the bad ones are held back
+                for item in batch:
+                    error = _send(outbox, data, table, [item], result)
+                    if error is None:
+                        continue
+                    _fail(outbox, [item], error, result)
+                    if classify_error(error) != PERMANENT:
+                        # Connection or server trouble; the rows after this one weren't sent and
+                        # keep their attempt count
+                        break
+            elif error is not None:
+                _fail(outbox, batch, error, result)
+            if error is not None and classify_error(error) != PERMANENT:
+                break
+    return result
+
+
+def _send(outbox, data, table, batch, result):
+    # Inserts one batch and records the outcome; returns the exception if the batch as a whole failed
+    entries = [entry for _, entry, _ in batch]
+    try:
+        inserted, duplicates = data.insert_batch(table, entries)
+        # A duplicate that carries our own id was inserted by an earlier, interrupted flush
+        already = data.existing_ids(table, [e["id"] for e in duplicates])
+    except Exception as e:
+        return e
+    conflicted = [e["id"] for e in duplicates if e["id"] not in already]
+    outbox.mark([e["id"] for e in inserted] + list(already), SYNCED)
+    outbox.mark(conflicted, CONFLICT, error="duplicate of an existing record")
+    result["synced"] += len(inserted) + len(already)
+    result["conflicts"] += len(conflicted)
+    return None
+
+
+def _fail(outbox, batch, error, result):
+    # Only called for rows that were actually sent
+    ids = [id_ for id_, _, _ in batch]
+    message = f"{type(error).__name__}: {error}"
+    kind = classify_error(error)
+    if kind == PERMANENT:
+        outbox.mark(ids, CONFLICT, error=message)
+        result["conflicts"] += len(ids)
+    else:
+        outbox.mark_failed(ids, message, limited=kind == SERVER)
+        result["failed"] += len(ids)
+
+
+class Syncer(threading.Thread):
+    def __init__(self, outbox, interval=SYNC_INTERVAL, data=None):
+        super().__init__(name="outbox-syncer", daemon=True)
+        self.outbox = outbox
+        self.interval = interval
+        self.data = data
+        self.last_result = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                self.last_result = flush(self.outbox, self.data)
+                self.outbox.prune_synced()
+            except Exception as e:
+                self.last_result = {"error": f"{type(e).__name__}: {e}"}
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def sync_now(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+
+_outbox = None
+_syncer = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    # Process-wide outbox with its syncer thread started on first use
+    global _outbox, _syncer
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = Outbox()
+                _syncer = Syncer(_outbox)
+                _syncer.start()
+    return _outbox
+
+
+def sync_now():
+    get_outbox()
+    _syncer.sync_now()
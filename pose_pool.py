@@ -0,0 +1,113 @@
+# pose_pool.py
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+# One Pose graph per concurrent worker; Streamlit runs each session's script in its own thread
+POOL_SIZE = int(os.getenv("POSE_POOL_SIZE", min(4, os.cpu_count() or 1)))
+
+
+class PosePool:
+    def __init__(self, size=POOL_SIZE, **pose_kwargs):
+        self.size = max(1, int(size))
+        self.pose_kwargs = pose_kwargs
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_pose(self):
+        # mediapipe takes a second or more to import; only pay for it when a graph is first built
+        import mediapipe as mp
+        return mp.solutions.pose.Pose(**self.pose_kwargs)
+
+    def acquire(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        # Graphs are built lazily, so a pool sized for 4 workers costs nothing until it's needed
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                build = True
+            else:
+                build = False
+        if build:
+            try:
+                return self._new_pose()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def release(self, pose):
+        self._idle.put(pose)
+
+    @contextmanager
+    def pose(self, timeout=None):
+        pose = self.acquire(timeout=timeout)
+        try:
+            yield pose
+        finally:
+            self.release(pose)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pose_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PosePool(static_image_mode=True, min_detection_confidence=0.5)
+    return _pool
+
+
+def acquire_pose(timeout=None):
+    return get_pose_pool().pose(timeout=timeout)
+
+
+_tracking_pool = None
+
+
+def get_tracking_pool():
+    # Video graphs: landmarks are tracked from the previous frame instead of re-detected every time.
+    # MediaPipe's own smoothing assumes evenly spaced frames, which adaptive frame skipping breaks,
+    # so it's off here and video_capture smooths with the real frame timestamps instead.
+    global _tracking_pool
+    if _tracking_pool is None:
+        with _pool_lock:
+            if _tracking_pool is None:
+                _tracking_pool = PosePool(static_image_mode=False, smooth_landmarks=False,
+                                          min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    return _tracking_pool
+
+
+@contextmanager
+def acquire_tracking_pose(timeout=None):
+    # Tracking state is per graph; reset it so one clip doesn't seed the next
+    with get_tracking_pool().pose(timeout=timeout) as pose:
+        reset = getattr(pose, "reset", None)
+        if reset is not None:
+            reset()
+        yield pose
+
+
+def warm_up():
+    # Build one graph and run it once, so the first real image doesn't pay for model load
+    import numpy as np
+    with acquire_pose() as pose:
+        pose.process(np.zeros((64, 64, 3), dtype=np.uint8))
@@ -0,0 +1,185 @@
+# scan_cache.py
+# Persistent cache for Gemini food-scan responses, keyed by a perceptual hash of the photo
+# plus the prompt and model name. Re-shot photos of the same plate land within a few bits
+# of each other, so lookups accept any entry within NEAR_DUP_BITS Hamming distance.
+# Callers store only answers that parse; get(validate=) drops any stored answer that doesn't.
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+CACHE_PATH = os.getenv("FOOD_SCAN_CACHE", os.path.join(".cache", "food_scans.sqlite3"))
+CACHE_TTL_SECONDS = int(os.getenv("FOOD_SCAN_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.getenv("FOOD_SCAN_CACHE_MB", 64)) * 1024 * 1024
+NEAR_DUP_BITS = int(os.getenv("FOOD_SCAN_NEAR_DUP_BITS", 6))
+
+HASH_SIZE = 8
+
+
+def perceptual_hash(image):
+    # dHash: sign of horizontal gradients on a 9x8 greyscale thumbnail, packed into 64 bits
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = px[row * (HASH_SIZE + 1) + col]
+            right = px[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def prompt_key(prompt, model_name):
+    return hashlib.blake2b(f"{model_name}\0{prompt}".encode(), digest_size=16).hexdigest()
+
+
+class ScanCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES, near_dup_bits=NEAR_DUP_BITS):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.near_dup_bits = near_dup_bits
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " phash TEXT NOT NULL, prompt_key TEXT NOT NULL, response TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (prompt_key, phash))"
+        )
+        self._db.commit()
+        self._expire()
+
+    def get(self, image, prompt, model_name, phash=None, validate=None):
+        phash = perceptual_hash(image) if phash is None else phash
+        key = prompt_key(prompt, model_name)
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT phash, response FROM scans WHERE prompt_key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchall()
+            best = None
+            for stored, response in rows:
+                distance = hamming(int(stored, 16), phash)
+                if distance <= self.near_dup_bits and (best is None or distance < best[0]):
+                    best = (distance, stored, response)
+            if best is not None and validate is not None and not validate(best[2]):
+                # A bad answer would otherwise be served for every rescan until the TTL ran out
+                self._db.execute("DELETE FROM scans WHERE prompt_key = ? AND phash = ?", (key, best[1]))
+                self._db.commit()
+                best = None
+            if best is None:
+                self.misses += 1
+                return None
+            if best[0] == 0:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            self._db.execute(
+                "UPDATE scans SET accessed = ? WHERE prompt_key = ? AND phash = ?", (now, key, best[1])
+            )
+            self._db.commit()
+            return best[2]
+
+    def put(self, image, prompt, model_name, response, phash=None):
+        phash = perceptual_hash(image) if phash is None else phash
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?, ?)",
+                (f"{phash:016x}", prompt_key(prompt, model_name), response, len(response.encode()), now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _expire(self):
+        with self._lock:
+            self._db.execute("DELETE FROM scans WHERE created < ?", (time.time() - self.ttl,))
+            self._db.commit()
+
+    def _evict(self):
+        # Least recently used first, until the stored responses fit the size budget
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM scans").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rowid, size in self._db.execute("SELECT rowid, size FROM scans ORDER BY accessed").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM scans WHERE rowid = ?", (rowid,))
+            total -= size
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM scans")
+            self._db.commit()
+        self.hits = self.near_hits = self.misses = 0
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    # Stands in for genai.GenerativeModel offline and in tests; records every call it receives.
+    # `latency` simulates a slow uplink and `failures` raises that many transient errors first.
+    model_name = "stub"
+
+    def __init__(self, text=None, latency=0.0, failures=0):
+        self.text = text or (
+            "Food Item | Quantity | Calories (kcal) | Protein (g) | Carbs (g) | Fats (g) | Vitamins & Minerals\n"
+            "-----------|----------|----------------|-------------|-----------|---------|---------------------\n"
+            "Rice | 1 cup | 205 | 4.3 | 45 | 0.4 | Manganese\n"
+        )
+        self.latency = latency
+        self.failures = failures
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, stream=False):
+        with self._lock:
+            self.calls.append(contents)
+            fail = self.failures > 0
+            self.failures -= fail
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("stub model: simulated transient failure")
+        if stream:
+            return [_StubResponse(line) for line in self.text.splitlines(keepends=True)]
+        return _StubResponse(self.text)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_scan_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScanCache()
+    return _cache
@@ -0,0 +1,153 @@
+# scan_queue.py
+# asyncio scan queue around the Gemini call, for staff scanning many meal photos in one sitting.
+# Concurrency is bounded by a semaphore, request rate by a token bucket sized to the API quota,
+# and transient errors are retried with exponential backoff and jitter. The quota belongs to the API
+# key, so one bucket is shared by every queue in the process, across clicks and sessions.
+import asyncio
+import os
+import random
+import threading
+import time
+
+from nutrition_table import NUTRITION_PROMPT, has_table, parse_nutrition_table
+from scan_cache import get_scan_cache
+from upload_prep import prepare_upload, timed_generate, timed_generate_async
+
+SCAN_CONCURRENCY = int(os.getenv("FOOD_SCAN_CONCURRENCY", 4))
+SCAN_RATE_PER_MINUTE = float(os.getenv("FOOD_SCAN_RATE_PER_MINUTE", 15))
+SCAN_MAX_RETRIES = int(os.getenv("FOOD_SCAN_MAX_RETRIES", 4))
+
+# google.api_core exception names, matched by name so the queue doesn't import the Google SDK
+TRANSIENT_ERRORS = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests"}
+
+
+def is_transient(error):
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or type(error).__name__ in TRANSIENT_ERRORS
+
+
+class TokenBucket:
+    # Thread-safe: each scan runs its own event loop, so an asyncio.Lock couldn't be shared
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity or max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # Takes a token, going into debt if none is left; returns how long to wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_token_bucket():
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = TokenBucket(SCAN_RATE_PER_MINUTE / 60.0)
+    return _bucket
+
+
+class ScanResult:
+    __slots__ = ("index", "table", "response", "error", "attempts", "seconds")
+
+    def __init__(self, index, table=None, response=None, error=None, attempts=0, seconds=0.0):
+        self.index = index
+        self.table = table
+        self.response = response
+        self.error = error
+        self.attempts = attempts
+        self.seconds = seconds
+
+
+class ScanQueue:
+    def __init__(self, model, concurrency=SCAN_CONCURRENCY, bucket=None,
+                 max_retries=SCAN_MAX_RETRIES, base_delay=1.0, max_delay=30.0, cache=None):
+        self.model = model
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache if cache is not None else get_scan_cache()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._bucket = bucket if bucket is not None else get_token_bucket()
+        self._tasks = set()
+
+    async def _generate(self, prepared, prompt):
+        if hasattr(self.model, "generate_content_async"):
+            response = await timed_generate_async(self.model, prepared, prompt)
+        else:
+            response = await asyncio.to_thread(timed_generate, self.model, prepared, prompt)
+        return response.text
+
+    async def scan(self, image, prompt=NUTRITION_PROMPT, index=0, original_bytes=None):
+        start = time.perf_counter()
+        cached = self.cache.get(image, prompt, self.model.model_name, validate=has_table) if self.cache else None
+        if cached is not None:
+            return ScanResult(index, parse_nutrition_table(cached), cached, seconds=time.perf_counter() - start)
+
+        attempt = 0
+        prepared = await asyncio.to_thread(prepare_upload, image, original_bytes=original_bytes)
+        async with self._semaphore:
+            while True:
+                attempt += 1
+                await self._bucket.acquire()
+                try:
+                    text = await self._generate(prepared, prompt)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt > self.max_retries or not is_transient(e):
+                        return ScanResult(index, error=e, attempts=attempt, seconds=time.perf_counter() - start)
+                    delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        table = parse_nutrition_table(text)
+        if self.cache and table is not None:
+            self.cache.put(image, prompt, self.model.model_name, text)
+        return ScanResult(index, table, text, attempts=attempt,
+                          seconds=time.perf_counter() - start)
+
+    async def scan_many(self, images, prompt=NUTRITION_PROMPT, sizes=None):
+        # Yields ScanResults in completion order; closing the generator early cancels what's left.
+        # sizes are the source files' byte counts, so the upload log can report bytes saved
+        sizes = sizes or [None] * len(images)
+        tasks = [asyncio.create_task(self.scan(image, prompt, i, size))
+                 for i, (image, size) in enumerate(zip(images, sizes))]
+        self._tasks.update(tasks)
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._tasks.difference_update(tasks)
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+async def scan_all(model, images, prompt=NUTRITION_PROMPT, on_result=None, sizes=None, **queue_kwargs):
+    queue = ScanQueue(model, **queue_kwargs)
+    results = [None] * len(images)
+    async for result in queue.scan_many(images, prompt, sizes):
+        results[result.index] = result
+        if on_result:
+            on_result(result)
+    return results
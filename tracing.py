@@ -0,0 +1,225 @@
+# tracing.py
+# Per-stage latency and memory metrics for the measurement, scan and data pipelines.
+#
+#   with stage("pose.process"):
+#       results = pose.process(proxy)
+#
+#   @traced("table.parse")
+#   def parse_nutrition_table(response): ...
+#
+# Each stage keeps call counts, totals and a window of recent durations (for p50 / p95), plus the
+# process's peak RSS seen at its end. TRACE_MEMORY=1 also tracks the Python-heap peak inside each
+# stage with tracemalloc; that is accurate but slows everything down, so it's for benchmarks.
+# Exporters: snapshot() / export_json(path), and Prometheus text on TRACE_PROMETHEUS_PORT (/metrics),
+# bound to TRACE_PROMETHEUS_HOST (loopback by default; stage names and timings aren't for everyone).
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENABLED = os.getenv("TRACE", "1") == "1"
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "0") == "1"
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", 1000))
+TRACE_PROMETHEUS_PORT = int(os.getenv("TRACE_PROMETHEUS_PORT", 0))
+TRACE_PROMETHEUS_HOST = os.getenv("TRACE_PROMETHEUS_HOST", "127.0.0.1")
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class StageStats:
+    __slots__ = ("calls", "errors", "total_s", "max_s", "window", "peak_rss", "peak_heap")
+
+    def __init__(self, window=TRACE_WINDOW):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.window = deque(maxlen=window)
+        self.peak_rss = None
+        self.peak_heap = None
+
+    def summary(self):
+        ordered = sorted(self.window)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": self.total_s * 1000,
+            "avg_ms": self.total_s / self.calls * 1000 if self.calls else None,
+            "p50_ms": _ms(percentile(ordered, 0.50)),
+            "p95_ms": _ms(percentile(ordered, 0.95)),
+            "max_ms": self.max_s * 1000,
+            "peak_rss_mb": _mb(self.peak_rss),
+            "peak_heap_mb": _mb(self.peak_heap),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def _mb(nbytes):
+    return None if nbytes is None else nbytes / (1024 * 1024)
+
+
+class Tracer:
+    def __init__(self, enabled=TRACE_ENABLED, memory=TRACE_MEMORY):
+        self.enabled = enabled
+        self.memory = memory
+        self._stages = defaultdict(StageStats)
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, name, seconds, error=False, heap_peak=None):
+        rss = peak_rss_bytes()
+        with self._lock:
+            stats = self._stages[name]
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.total_s += seconds
+            stats.max_s = max(stats.max_s, seconds)
+            stats.window.append(seconds)
+            if rss is not None:
+                stats.peak_rss = max(stats.peak_rss or 0, rss)
+            if heap_peak is not None:
+                stats.peak_heap = max(stats.peak_heap or 0, heap_peak)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        # tracemalloc's peak is process-wide, so concurrent stages can inflate each other's figure
+        if self.memory:
+            tracemalloc.reset_peak()
+        error = False
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            # Only real failures count; Streamlit's rerun / stop and GeneratorExit are control flow
+            error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            heap_peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            self.record(name, seconds, error, heap_peak)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._stages.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def prometheus_text(self):
+        lines = [
+            "# TYPE app_stage_seconds summary",
+            "# TYPE app_stage_errors_total counter",
+            "# TYPE app_stage_peak_rss_bytes gauge",
+        ]
+        with self._lock:
+            items = sorted(self._stages.items())
+            for name, stats in items:
+                ordered = sorted(stats.window)
+                label = f'stage="{name}"'
+                for q in (0.5, 0.95):
+                    value = percentile(ordered, q)
+                    if value is not None:
+                        lines.append(f'app_stage_seconds{{{label},quantile="{q}"}} {value:.6f}')
+                lines.append(f"app_stage_seconds_sum{{{label}}} {stats.total_s:.6f}")
+                lines.append(f"app_stage_seconds_count{{{label}}} {stats.calls}")
+                lines.append(f"app_stage_errors_total{{{label}}} {stats.errors}")
+                if stats.peak_rss is not None:
+                    lines.append(f"app_stage_peak_rss_bytes{{{label}}} {stats.peak_rss}")
+        return "\n".join(lines) + "\n"
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def stage(name):
+    return get_tracer().stage(name)
+
+
+def traced(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        body = get_tracer().prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port=TRACE_PROMETHEUS_PORT, host=TRACE_PROMETHEUS_HOST):
+    # Serves /metrics in a daemon thread, once per process; no-op unless a port is configured
+    global _exporter
+    if not port:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_exporter.serve_forever, name="metrics-exporter", daemon=True).start()
+    return _exporter
@@ -0,0 +1,108 @@
+# upload_prep.py
+# Shrinks food photos before they go to Gemini: resize to a target long edge, re-encode as
+# JPEG/WebP and drop EXIF. Rural uplinks are the bottleneck, not the model.
+import io
+import os
+import threading
+import time
+from collections import deque
+
+from PIL import Image, ImageOps
+
+from tracing import stage, traced
+
+UPLOAD_LONG_EDGE = int(os.getenv("FOOD_SCAN_LONG_EDGE", 1024))
+UPLOAD_FORMAT = os.getenv("FOOD_SCAN_FORMAT", "JPEG").upper()
+UPLOAD_QUALITY = int(os.getenv("FOOD_SCAN_QUALITY", 80))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class PreparedUpload:
+    __slots__ = ("data", "mime_type", "size", "original_bytes")
+
+    def __init__(self, data, mime_type, size, original_bytes):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size
+        self.original_bytes = original_bytes
+
+    @property
+    def blob(self):
+        # Inline-data part accepted by generate_content alongside the prompt
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    @property
+    def bytes_saved(self):
+        if self.original_bytes is None:
+            return None
+        return self.original_bytes - len(self.data)
+
+
+@traced("llm.prepare_upload")
+def prepare_upload(image, long_edge=UPLOAD_LONG_EDGE, fmt=UPLOAD_FORMAT, quality=UPLOAD_QUALITY, original_bytes=None):
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Unsupported upload format {fmt!r}; use one of {sorted(MIME_TYPES)}")
+    # Apply the EXIF rotation before discarding EXIF, otherwise portrait photos arrive sideways
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    if long_edge and max(image.size) > long_edge:
+        image = image.copy()
+        image.thumbnail((long_edge, long_edge), Image.LANCZOS)
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, quality=quality, optimize=fmt == "JPEG")
+    return PreparedUpload(buf.getvalue(), MIME_TYPES[fmt], image.size, original_bytes)
+
+
+class UploadLog:
+    # Recent uploads: bytes sent, bytes saved and model round-trip time
+    def __init__(self, maxlen=200):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def record(self, prepared, seconds):
+        with self._lock:
+            self.total += 1
+            self._records.append({
+                "bytes_sent": len(prepared.data),
+                "bytes_saved": prepared.bytes_saved,
+                "round_trip_s": round(seconds, 3),
+                "size": prepared.size,
+            })
+
+    def last(self):
+        with self._lock:
+            return self._records[-1] if self._records else None
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+
+upload_log = UploadLog()
+
+
+def timed_generate(model, prepared, prompt):
+    start = time.perf_counter()
+    with stage("llm.generate"):
+        response = model.generate_content([prepared.blob, prompt])
+    upload_log.record(prepared, time.perf_counter() - start)
+    return response
+
+
+async def timed_generate_async(model, prepared, prompt):
+    # Same bookkeeping as timed_generate, for models with a native async call
+    start = time.perf_counter()
+    with stage("llm.generate"):
+        response = await model.generate_content_async([prepared.blob, prompt])
+    upload_log.record(prepared, time.perf_counter() - start)
+    return response
+
+
+def timed_stream(model, prepared, prompt):
+    # Yields response text chunks; the round trip is recorded once the stream is drained
+    start = time.perf_counter()
+    with stage("llm.stream"):
+        for chunk in model.generate_content([prepared.blob, prompt], stream=True):
+            yield chunk.text
+    upload_log.record(prepared, time.perf_counter() - start)
@@ -0,0 +1,343 @@
+# video_capture.py
+# Height and MUAC from a short video clip or a burst of photos instead of a single still.
+# Frames stream through a tracking-mode Pose graph, which follows the child from the previous frame
+# instead of re-detecting them every time. The result is the median over frames, with a 95% interval
+# that allows for consecutive frames being nearly the same measurement.
+#   frames     decoded one at a time by a generator, so memory doesn't grow with clip length
+#   pacing     source frames are skipped adaptively, so processing holds VIDEO_TARGET_FPS, or less if
+#              the CPU can't keep up; the clip still finishes in about its own duration
+#   smoothing  a One-Euro filter per landmark on the real frame timestamps: it damps jitter when the
+#              child is still and follows quickly when they move
+#   scale      the reference object (calibration.detect_reference) is found in the first frames
+#              that show it, and the camera is assumed to stay put
+# Live in-browser streaming would need a WebRTC component; clips and bursts cover capture on phones.
+import math
+import os
+import tempfile
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from anthropometry import PL, PoseLandmarks, fit_within
+from app_state import tool_state, widget_key, share_measurement
+from calibration import CALIBRATION_REFERENCE, REFERENCE_LABELS, detect_reference
+from child_records import save_photo_measurement
+from pose_pool import acquire_tracking_pose
+from tracing import stage
+
+VIDEO_TARGET_FPS = float(os.getenv("VIDEO_TARGET_FPS", 8))
+# Frames are processed at no more than this; landmarks and the reference are measured at this size
+VIDEO_MAX_SIDE = int(os.getenv("VIDEO_MAX_SIDE", 960))
+# Look for the reference in this many processed frames before giving up on the clip
+VIDEO_CALIBRATION_FRAMES = int(os.getenv("VIDEO_CALIBRATION_FRAMES", 10))
+MIN_VISIBILITY = 0.6
+# Per-frame estimates kept for the median; a bounded window, so long clips don't accumulate
+MAX_SAMPLES = 900
+# One-Euro parameters for landmark pixels: cutoff (Hz) at rest, and how fast it opens with speed
+SMOOTH_MIN_CUTOFF = 1.0
+SMOOTH_BETA = 0.01
+VIDEO_TYPES = ["mp4", "mov", "m4v", "avi", "webm"]
+KINDS = {"Height": "height", "MUAC": "arm"}
+
+
+class Pacer:
+    # Picks the stride through the source frames from the measured per-frame processing cost
+    def __init__(self, target_fps=VIDEO_TARGET_FPS, source_fps=None):
+        self.target_fps = target_fps
+        self.source_fps = source_fps or target_fps
+        self.cost = None
+
+    def record(self, seconds):
+        self.cost = seconds if self.cost is None else 0.8 * self.cost + 0.2 * seconds
+
+    @property
+    def rate(self):
+        # Frames per second of video that can be processed in real time
+        if not self.cost:
+            return self.target_fps
+        return min(self.target_fps, 1.0 / self.cost)
+
+    @property
+    def stride(self):
+        return max(1, math.ceil(self.source_fps / self.rate))
+
+
+def video_frames(path, pacer, max_side=VIDEO_MAX_SIDE):
+    # Yields (seconds into the clip, rgb, fraction done); skipped frames are grabbed but not converted
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open the video.")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        pacer.source_fps = fps
+        index, next_index = -1, 0
+        while capture.grab():
+            index += 1
+            if index < next_index:
+                continue
+            ok, bgr = capture.retrieve()
+            if not ok:
+                break
+            next_index = index + pacer.stride
+            with stage("video.decode"):
+                frame, _ = fit_within(bgr, max_side)
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            yield index / fps, rgb, min(1.0, (index + 1) / total) if total else None
+    finally:
+        capture.release()
+
+
+def burst_frames(files, pacer, max_side=VIDEO_MAX_SIDE):
+    # A burst of stills in capture order; each counts as one tracked frame at the target rate
+    for i, f in enumerate(files):
+        with stage("video.decode"):
+            bgr = cv2.imdecode(np.frombuffer(f.getvalue(), np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                continue
+            frame, _ = fit_within(bgr, max_side)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        yield i / pacer.target_fps, rgb, (i + 1) / len(files)
+
+
+class OneEuroFilter:
+    # Casiez et al.'s 1€ filter, vectorised over all landmark coordinates
+    def __init__(self, min_cutoff=SMOOTH_MIN_CUTOFF, beta=SMOOTH_BETA, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if self.x is None:
+            self.x, self.dx, self.t = x, np.zeros_like(x), t
+            return x
+        dt = max(t - self.t, 1e-3)
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.dx = a_d * (x - self.x) / dt + (1 - a_d) * self.dx
+        a = self._alpha(self.min_cutoff + self.beta * np.abs(self.dx), dt)
+        self.x = a * x + (1 - a) * self.x
+        self.t = t
+        return self.x
+
+
+def track(frames):
+    # Yields (t, rgb, fraction, smoothed PoseLandmarks or None) per processed frame
+    smoother = OneEuroFilter()
+    with acquire_tracking_pose() as pose:
+        for t, rgb, fraction in frames:
+            with stage("pose.track"):
+                results = pose.process(rgb)
+            landmarks = None
+            if results.pose_landmarks:
+                h, w = rgb.shape[:2]
+                landmarks = PoseLandmarks.from_results(results, w, h)
+                size = np.array([w, h], np.float32)
+                landmarks.coords[:, :2] = smoother(landmarks.coords[:, :2] * size, t) / size
+            yield t, rgb, fraction, landmarks
+
+
+def pixel_length(landmarks, kind):
+    # (length in frame pixels, the two points it spans) for height (nose to lower ankle, drawn as a
+    # vertical line) or the more visible arm's shoulder-elbow; None if not clearly visible
+    if kind == "height":
+        ankle = max((PL.LEFT_ANKLE, PL.RIGHT_ANKLE), key=lambda p: landmarks.coords[p, 1])
+        if min(landmarks.visibility(PL.NOSE), landmarks.visibility(ankle)) < MIN_VISIBILITY:
+            return None
+        head_y, foot_y = landmarks.height_points()
+        x = landmarks.width // 2
+        return float(abs(foot_y - head_y)), ((x, head_y), (x, foot_y))
+    arms = ((PL.LEFT_SHOULDER, PL.LEFT_ELBOW), (PL.RIGHT_SHOULDER, PL.RIGHT_ELBOW))
+    shoulder, elbow = max(arms, key=lambda a: min(landmarks.visibility(a[0]), landmarks.visibility(a[1])))
+    if min(landmarks.visibility(shoulder), landmarks.visibility(elbow)) < MIN_VISIBILITY:
+        return None
+    (x1, y1), (x2, y2) = (landmarks.coords[p, :2] * (landmarks.width, landmarks.height) for p in (shoulder, elbow))
+    return float(np.hypot(x2 - x1, y2 - y1)), (landmarks.point(shoulder), landmarks.point(elbow))
+
+
+def effective_samples(values):
+    # n / integrated autocorrelation time. Tracked, smoothed frames are strongly correlated, so a
+    # clip of hundreds of frames may hold only a handful of independent measurements.
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    x = x - x.mean()
+    variance = float(x @ x)
+    if n < 3 or variance == 0:
+        return float(n)
+    tau = 1.0
+    for lag in range(1, n // 2):
+        rho = float(x[:-lag] @ x[lag:]) / variance
+        if rho <= 0:
+            # Sum the initial positive stretch only; beyond it the estimates are noise
+            break
+        tau += 2 * rho
+    return n / tau
+
+
+def median_interval(values, z=1.96):
+    # Median with a distribution-free ~95% interval from order statistics, sized by the effective
+    # number of independent frames rather than the raw frame count; no bounds below 3 of those
+    values = np.asarray(values, dtype=float)
+    median = float(np.median(values))
+    n_eff = effective_samples(values)
+    if n_eff < 3:
+        return median, None, None
+    half = z / (2 * math.sqrt(n_eff))
+    low, high = np.quantile(values, [max(0.0, 0.5 - half), min(1.0, 0.5 + half)])
+    return median, float(low), float(high)
+
+
+class ClipMeasurement:
+    # Running state for one clip: pixel lengths per frame and the scale once the reference is seen
+    def __init__(self, kind, reference_length, cm_per_pixel=None):
+        self.kind = kind
+        self.reference_length = reference_length
+        self.cm_per_pixel = cm_per_pixel
+        # In frame order; the interval's autocorrelation estimate depends on it
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.frames = 0
+        self.calibration_tries = 0
+        self.last_frame = None
+
+    def feed(self, rgb, landmarks):
+        self.frames += 1
+        if self.cm_per_pixel is None and self.calibration_tries < VIDEO_CALIBRATION_FRAMES:
+            self.calibration_tries += 1
+            reference = detect_reference(rgb)
+            if reference is not None:
+                self.cm_per_pixel = reference.cm_per_pixel(self.reference_length)
+        if landmarks is not None:
+            measured = pixel_length(landmarks, self.kind)
+            if measured and measured[0]:
+                length, endpoints = measured
+                self.samples.append(length)
+                # The frame and the exact points measured in it, for the overlay
+                self.last_frame = (rgb, endpoints)
+
+    def summary(self):
+        # Pixel lengths from before the reference was found are still usable: the camera hasn't moved
+        if self.cm_per_pixel is None or not self.samples:
+            return None
+        values = np.asarray(self.samples) * self.cm_per_pixel
+        median, low, high = median_interval(values)
+        return {"value": round(median, 2), "low": None if low is None else round(low, 2),
+                "high": None if high is None else round(high, 2), "frames_used": len(self.samples),
+                "independent_frames": round(effective_samples(values), 1),
+                "frames_processed": self.frames, "cm_per_pixel": self.cm_per_pixel}
+
+
+def measure_frames(frames, pacer, kind, reference_length, cm_per_pixel=None):
+    # Generator over a frame source: yields (fraction done, running ClipMeasurement) per processed frame
+    clip = ClipMeasurement(kind, reference_length, cm_per_pixel)
+    start = time.perf_counter()
+    for _, rgb, fraction, landmarks in track(frames):
+        with stage("video.measure"):
+            clip.feed(rgb, landmarks)
+        # The pacer sees the whole per-frame cost: grabbing and decoding, tracking, and measuring,
+        # including reference detection on the first frames
+        now = time.perf_counter()
+        pacer.record(now - start)
+        start = now
+        yield fraction, clip
+
+
+def measure_clip(data, kind, reference_length, suffix=".mp4", target_fps=VIDEO_TARGET_FPS, progress=None):
+    # Whole-clip convenience wrapper; OpenCV only reads video from a path, so the upload is spooled to disk
+    pacer = Pacer(target_fps)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        clip = None
+        for fraction, clip in measure_frames(video_frames(path, pacer), pacer, kind, reference_length):
+            if progress is not None and fraction is not None:
+                progress(fraction)
+        return clip, pacer
+    finally:
+        os.unlink(path)
+
+
+def measure_burst(files, kind, reference_length, target_fps=VIDEO_TARGET_FPS, progress=None):
+    pacer = Pacer(target_fps)
+    clip = None
+    for fraction, clip in measure_frames(burst_frames(files, pacer), pacer, kind, reference_length):
+        if progress is not None:
+            progress(fraction)
+    return clip, pacer
+
+
+def draw_measurement(rgb, endpoints):
+    # The segment pixel_length measured, so the overlay shows the same limb as the estimate
+    canvas = rgb.copy()
+    a, b = endpoints
+    cv2.line(canvas, a, b, (0, 255, 0), 3)
+    for point in endpoints:
+        cv2.circle(canvas, point, 5, (255, 0, 0), -1)
+    return canvas
+
+
+def run_video_capture(username=None):
+    state = tool_state("video", result=None)
+    st.title("Video Capture")
+    st.markdown("Record a few seconds of the child standing still **with the reference object in view** "
+                f"({REFERENCE_LABELS[CALIBRATION_REFERENCE]}). Every frame is measured and the median is reported.")
+    label = st.radio("Measure", list(KINDS), horizontal=True, key=widget_key("video", "kind"))
+    kind = KINDS[label]
+    source = st.radio("Source", ["Video clip", "Photo burst"], horizontal=True, key=widget_key("video", "source"))
+    if source == "Video clip":
+        upload = st.file_uploader("Upload a short clip", type=VIDEO_TYPES, key=widget_key("video", "clip"))
+    else:
+        upload = st.file_uploader("Upload the photos in order", type=["jpg", "jpeg", "png"],
+                                  accept_multiple_files=True, key=widget_key("video", "burst"))
+    reference_length = st.number_input("Enter the real-world length of the reference object (in cm)", min_value=1.0,
+                                       step=0.5, key=widget_key("video", "reference"))
+    target_fps = st.slider("Frames analysed per second", 2, 30, int(VIDEO_TARGET_FPS), key=widget_key("video", "fps"),
+                           help="Upper bound; frames are skipped further if this device can't keep up")
+
+    if upload and st.button("Measure", key=widget_key("video", "measure")):
+        bar = st.progress(0.0, text="Tracking…")
+        progress = lambda fraction: bar.progress(fraction, text="Tracking…")
+        try:
+            if source == "Video clip":
+                clip, pacer = measure_clip(upload.getvalue(), kind, reference_length,
+                                           os.path.splitext(upload.name)[1] or ".mp4", target_fps, progress)
+            else:
+                clip, pacer = measure_burst(upload, kind, reference_length, target_fps, progress)
+        except ValueError as e:
+            bar.empty()
+            st.error(str(e))
+            return state["result"]
+        bar.empty()
+        summary = clip.summary() if clip is not None else None
+        state.update(kind=kind, result=summary, fps=pacer.rate,
+                     preview=draw_measurement(*clip.last_frame) if summary else None)
+        if summary is None:
+            if clip is None or not clip.samples:
+                st.error("❌ Could not track the child clearly in any frame. Keep the whole body (or arm) in view.")
+            else:
+                st.error(f"❌ No {REFERENCE_LABELS[CALIBRATION_REFERENCE]} found in the first "
+                         f"{VIDEO_CALIBRATION_FRAMES} frames. Keep it in view from the start, or use the photo tool.")
+
+    summary = state["result"]
+    if summary and state.get("kind") == kind:
+        st.image(state["preview"], caption="Last tracked frame")
+        interval = "" if summary["low"] is None else f" (95% interval {summary['low']:.2f}–{summary['high']:.2f} cm)"
+        st.success(f"Estimated {label}: **{summary['value']:.2f} cm**{interval}")
+        st.caption(f"Median of {summary['frames_used']} of {summary['frames_processed']} analysed frames, "
+                   f"at about {state['fps']:.1f} frames per second. Consecutive frames are nearly the same "
+                   f"measurement; the interval counts them as about {summary['independent_frames']:g} independent ones.")
+        share_measurement(kind, summary["value"])
+        st.caption(f"{label} filled in on the Nutrition Input page.")
+        if username:
+            save_photo_measurement(username, f"video_{kind}", **{kind: summary["value"]})
+    return summary
@@ -0,0 +1,116 @@
+# view_data.py
+# "View Data": keyset-paginated, column-projected record browser with server-side filters.
+# Pages are kept in session state, so a rerun only fetches what the session doesn't already have.
+import datetime
+
+import streamlit as st
+
+from child_records import show_child_growth
+from data_access import get_data_access, page_cursor, PAGE_SIZE
+
+NUTRITION_FIELDS = ["name", "age", "sex", "age_months", "weight", "height", "arm", "bmi", "status",
+                    "waz", "haz", "whz", "baz", "source", "measured_at", "created_at"]
+FOOD_FIELDS = ["name", "meal_date", "meal_time", "nutrition_table", "created_at"]
+STATUSES = ["Severe Malnutrition", "Moderate Malnutrition", "Mild Malnutrition", "Normal", "Overweight"]
+MEAL_TIMES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+
+
+def build_filters(username, name=None, status=None, meal_time=None, date_range=None, date_column="created_at"):
+    # date_column is when the record happened (measured_at / meal_date), not when it reached the server
+    filters = [("username", "eq", username)]
+    if name:
+        filters.append(("name", "ilike", f"%{name}%"))
+    if status:
+        filters.append(("status", "eq", status))
+    if meal_time:
+        filters.append(("meal_time", "eq", meal_time))
+    if date_range and len(date_range) == 2:
+        start, end = date_range
+        filters.append((date_column, "gte", start.isoformat()))
+        filters.append((date_column, "lt", (end + datetime.timedelta(days=1)).isoformat()))
+    return filters
+
+
+def _view_state(key, table, columns, filters):
+    # Drop cached pages whenever the projection or filters change
+    signature = (table, columns, tuple(filters))
+    state = st.session_state.get(key)
+    if state is None or state["signature"] != signature:
+        state = {"signature": signature, "rows": [], "exhausted": False}
+        st.session_state[key] = state
+    return state
+
+
+def _load_more(state, table, columns, filters):
+    data = get_data_access()
+    cursor = page_cursor(state["rows"][-1]) if state["rows"] else None
+    page = data.page(table, columns, filters, cursor=cursor, limit=PAGE_SIZE)
+    state["rows"].extend(page)
+    state["exhausted"] = len(page) < PAGE_SIZE
+
+
+def _load_newer(state, table, columns, filters):
+    if not state["rows"]:
+        # Nothing loaded yet, so no newest row to compare with: start paging from the top again
+        _load_more(state, table, columns, filters)
+        return len(state["rows"])
+    # Paging stays in sync order (created_at), so records captured offline still arrive as "new"
+    newer = get_data_access().newer_than(table, columns, filters, cursor=page_cursor(state["rows"][0]))
+    state["rows"][:0] = newer
+    return len(newer)
+
+
+def record_browser(title, table, username, fields, default_fields, filter_widgets):
+    st.header(title)
+    key = f"view_{table}"
+    selected = st.multiselect("Columns", fields, default=default_fields, key=f"{key}_columns")
+    filters = build_filters(username, **filter_widgets(key))
+    columns = ",".join(selected or default_fields)
+
+    state = _view_state(key, table, columns, filters)
+    if not state["rows"] and not state["exhausted"]:
+        _load_more(state, table, columns, filters)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Check for new records", key=f"{key}_newer"):
+            added = _load_newer(state, table, columns, filters)
+            st.caption(f"{added} new record(s)")
+    with col2:
+        if not state["exhausted"] and st.button("Load more", key=f"{key}_more"):
+            _load_more(state, table, columns, filters)
+
+    if state["rows"]:
+        shown = [{c: row.get(c) for c in selected or default_fields} for row in state["rows"]]
+        st.dataframe(shown, use_container_width=True)
+        st.caption(f"Showing {len(shown)} record(s){'' if state['exhausted'] else ' — more available'}")
+    else:
+        st.info("No matching records.")
+
+
+def _nutrition_filters(key):
+    with st.expander("Filters"):
+        name = st.text_input("Child name contains", key=f"{key}_name")
+        status = st.selectbox("Status", [""] + STATUSES, key=f"{key}_status")
+        date_range = st.date_input("Date range", value=(), key=f"{key}_dates")
+    # Entries captured offline sync later, so created_at would put them on the wrong day
+    return {"name": name, "status": status or None, "date_range": date_range, "date_column": "measured_at"}
+
+
+def _food_filters(key):
+    with st.expander("Filters"):
+        name = st.text_input("Child name contains", key=f"{key}_name")
+        meal_time = st.selectbox("Meal time", [""] + MEAL_TIMES, key=f"{key}_meal")
+        date_range = st.date_input("Date range", value=(), key=f"{key}_dates")
+    return {"name": name, "meal_time": meal_time or None, "date_range": date_range, "date_column": "meal_date"}
+
+
+def run_view_data(username):
+    show_child_growth(username)
+    record_browser("Your Child Nutrition Records", "nutrition_data", username,
+                   NUTRITION_FIELDS, ["name", "age", "weight", "height", "bmi", "status", "measured_at"],
+                   _nutrition_filters)
+    # nutrition_table is a JSON blob per row, so it's only fetched when the column is selected
+    record_browser("Your Food Scan Records", "food_data", username,
+                   FOOD_FIELDS, ["name", "meal_time", "created_at"],
+                   _food_filters)
@@ -0,0 +1,52 @@
+# warmup.py
+# Optional background warm-up, started after login: imports the heavy CV / LLM stacks and builds a
+# pose graph while the user is still choosing a tool, so the first measurement or scan doesn't pay
+# for them. APP_WARMUP=0 turns it off (e.g. on a memory-tight host that only does data entry).
+import importlib
+import os
+import threading
+import time
+
+WARMUP = os.getenv("APP_WARMUP", "1") == "1"
+WARMUP_MODULES = ("numpy", "pandas", "cv2", "mediapipe", "google.generativeai",
+                  "anthropometry", "image_cache", "height_module", "muac_module",
+                  "video_capture", "food_module")
+
+_timings = {}
+_thread = None
+_lock = threading.Lock()
+
+
+def _timed(name, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # Best effort: the real import or inference reports the error where it matters
+        _timings[name] = f"{type(e).__name__}: {e}"
+        return
+    _timings[name] = time.perf_counter() - start
+
+
+def _run(modules):
+    for name in modules:
+        _timed(name, lambda: importlib.import_module(name))
+    from pose_pool import warm_up
+    _timed("pose graph", warm_up)
+
+
+def start_warmup(modules=WARMUP_MODULES):
+    # Once per process; later calls (every rerun after login) return the same thread
+    global _thread
+    if not WARMUP:
+        return None
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, args=(modules,), name="warmup", daemon=True)
+            _thread.start()
+    return _thread
+
+
+def warmup_timings():
+    # {module or stage: seconds, or an error string}
+    return dict(_timings)
@@ -0,0 +1,232 @@
+# zscore.py
+# WHO growth-standard z-scores (weight-for-age, height-for-age, weight-for-length/height, BMI-for-age)
+# computed in vectorized batches from the published LMS reference tables.
+#
+# Tables live in WHO_TABLES_DIR (default who_tables/), one file per indicator, named as in the
+# WHO igrowup / anthro distribution:
+#   weianthro.txt  lenanthro.txt  bmianthro.txt  (index: age in days, 0-1856)
+#   wflanthro.txt  wfhanthro.txt                  (index: length / height in cm, 0.1 cm steps)
+# Each is tab- or comma-separated with a header naming sex (1 = male, 2 = female), the index
+# column (age / length / height), and l, m, s. Other columns are ignored. The first load parses
+# the text and writes a compact .npz next to it; later loads read the .npz.
+#
+#   python zscore.py check   # spot-checks the LMS math against published WHO values; no tables needed
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+WHO_TABLES_DIR = os.getenv("WHO_TABLES_DIR", "who_tables")
+
+INDICATORS = {
+    "wfa": "weianthro",
+    "hfa": "lenanthro",
+    "bfa": "bmianthro",
+    "wfl": "wflanthro",
+    "wfh": "wfhanthro",
+}
+# Weight-based indicators use WHO's restricted extrapolation beyond +/-3 SD
+RESTRICTED = {"wfa", "bfa", "wfl", "wfh"}
+INDEX_COLUMNS = ("age", "length", "height", "x")
+DAYS_PER_MONTH = 30.4375
+WFL_MAX_AGE_DAYS = 730  # recumbent length under 24 months, standing height from then on
+
+MALE, FEMALE = 1, 2
+
+
+class LMSTable:
+    # Per-sex sorted index grid with matching L, M, S arrays
+    __slots__ = ("indicator", "grids")
+
+    def __init__(self, indicator, grids):
+        self.indicator = indicator
+        self.grids = grids  # {sex: (x, l, m, s)}
+
+    @classmethod
+    def from_frame(cls, indicator, df):
+        df = df.rename(columns=str.lower)
+        index_col = next((c for c in INDEX_COLUMNS if c in df), None)
+        if index_col is None or not {"sex", "l", "m", "s"} <= set(df.columns):
+            raise ValueError(f"{indicator}: expected columns sex, age|length|height, l, m, s")
+        grids = {}
+        for sex in (MALE, FEMALE):
+            part = df[df["sex"] == sex].sort_values(index_col)
+            grids[sex] = tuple(part[c].to_numpy(np.float64) for c in (index_col, "l", "m", "s"))
+        return cls(indicator, grids)
+
+    @classmethod
+    def load(cls, indicator, directory=WHO_TABLES_DIR):
+        stem = os.path.join(directory, INDICATORS[indicator])
+        cached = stem + ".npz"
+        source = stem + ".txt"
+        if os.path.exists(cached) and (not os.path.exists(source) or os.path.getmtime(cached) >= os.path.getmtime(source)):
+            with np.load(cached) as npz:
+                return cls(indicator, {sex: tuple(npz[f"{k}{sex}"] for k in "xlms") for sex in (MALE, FEMALE)})
+        if not os.path.exists(source):
+            raise FileNotFoundError(
+                f"WHO reference table {source} not found; see the header of zscore.py for the expected files"
+            )
+        table = cls.from_frame(indicator, pd.read_csv(source, sep=None, engine="python"))
+        np.savez(cached, **{f"{k}{sex}": arr for sex, grid in table.grids.items() for k, arr in zip("xlms", grid)})
+        return table
+
+    def lms(self, sex, x):
+        # Linear interpolation of L, M, S at x; NaN outside the table's range or for unknown sex
+        x = np.asarray(x, dtype=np.float64)
+        sex = np.asarray(sex)
+        out = np.full((3,) + x.shape, np.nan)
+        for code, (grid, l, m, s) in self.grids.items():
+            mask = (sex == code) & (x >= grid[0]) & (x <= grid[-1])
+            if mask.any():
+                xs = x[mask]
+                out[0][mask] = np.interp(xs, grid, l)
+                out[1][mask] = np.interp(xs, grid, m)
+                out[2][mask] = np.interp(xs, grid, s)
+        return out
+
+
+def lms_zscore(value, l, m, s, restricted=False):
+    value = np.asarray(value, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(np.abs(l) < 1e-12, np.log(value / m) / s, ((value / m) ** l - 1) / (l * s))
+        if restricted:
+            # WHO: beyond +/-3 SD, distance is measured in units of the 2-3 SD interval
+            def sd(k):
+                return m * (1 + l * s * k) ** (1 / l)
+            sd3pos, sd2pos, sd3neg, sd2neg = sd(3), sd(2), sd(-3), sd(-2)
+            z = np.where(z > 3, 3 + (value - sd3pos) / (sd3pos - sd2pos), z)
+            z = np.where(z < -3, -3 + (value - sd3neg) / (sd2neg - sd3neg), z)
+    return z
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table(indicator):
+    # Tables are parsed once per process and shared
+    table = _tables.get(indicator)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(indicator)
+            if table is None:
+                table = _tables[indicator] = LMSTable.load(indicator)
+    return table
+
+
+def tables_available(directory=WHO_TABLES_DIR):
+    return all(
+        os.path.exists(os.path.join(directory, stem + ".txt")) or os.path.exists(os.path.join(directory, stem + ".npz"))
+        for stem in INDICATORS.values()
+    )
+
+
+def normalize_sex(sex):
+    # Accepts 1/2, "M"/"F", "male"/"female" (any case); anything else becomes 0 (unknown)
+    arr = np.asarray(sex)
+    if arr.dtype.kind in "iu":
+        return np.where((arr == MALE) | (arr == FEMALE), arr, 0)
+    values = pd.Series(np.asarray(sex, dtype=object).ravel())
+    text = values.astype(str).str.strip().str.lower().str[:1]
+    codes = np.where(text.isin(["1", "m", "b"]), MALE, np.where(text.isin(["2", "f", "g"]), FEMALE, 0))
+    return codes.reshape(np.shape(sex))
+
+
+def zscore(indicator, sex, x, value):
+    l, m, s = get_table(indicator).lms(normalize_sex(sex), x)
+    return lms_zscore(value, l, m, s, restricted=indicator in RESTRICTED)
+
+
+def compute_zscores(sex, age_days, weight, height_cm):
+    # All four indicators for whole columns; missing inputs or out-of-range ages give NaN
+    sex = normalize_sex(sex)
+    age_days = np.asarray(age_days, dtype=np.float64)
+    weight = np.asarray(weight, dtype=np.float64)
+    height_cm = np.asarray(height_cm, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = weight / (height_cm / 100) ** 2
+
+    under_two = age_days < WFL_MAX_AGE_DAYS
+    whz = zscore("wfh", sex, height_cm, weight)
+    if under_two.any():
+        whz[under_two] = zscore("wfl", sex[under_two], height_cm[under_two], weight[under_two])
+    return {
+        "waz": zscore("wfa", sex, age_days, weight),
+        "haz": zscore("hfa", sex, age_days, height_cm),
+        "whz": whz,
+        "baz": zscore("bfa", sex, age_days, bmi),
+    }
+
+
+def add_zscores(df, sex="sex", age_months="age_months", weight="weight", height="height"):
+    # Adds waz / haz / whz / baz (rounded to 2 dp) to a copy of df
+    out = df.copy()
+    scores = compute_zscores(df[sex].to_numpy(), df[age_months].to_numpy(np.float64) * DAYS_PER_MONTH,
+                             df[weight].to_numpy(), df[height].to_numpy())
+    for name, values in scores.items():
+        out[name] = np.round(values, 2)
+    return out
+
+
+def classify_whz(whz):
+    # WHO wasting categories from weight-for-height z: < -3, -3 to < -2, -2 to +2, > +2
+    whz = np.asarray(whz, dtype=np.float64)
+    codes = np.searchsorted([-3, -2], whz, side="right") + (whz > 2)
+    codes[np.isnan(whz)] = -1
+    return pd.Categorical.from_codes(
+        codes, categories=["Severe Wasting", "Moderate Wasting", "Normal", "Overweight"]
+    )
+
+
+def zscores_for_entry(sex, age_months, weight, height_cm):
+    # Scalar convenience for the entry form; missing scores come back as None
+    scores = compute_zscores([sex], [age_months * DAYS_PER_MONTH], [weight], [height_cm])
+    return {k: round(float(v[0]), 2) if np.isfinite(v[0]) else None for k, v in scores.items()}
+
+
+# Published WHO Child Growth Standards rows: (label, L, M, S, {z: SD-curve value as printed})
+SPOT_CHECKS = [
+    ("weight-for-age, boys, birth", 0.3487, 3.3464, 0.14602, {-3: 2.1, -2: 2.5, 0: 3.3, 2: 4.4, 3: 5.0}),
+    ("weight-for-age, girls, birth", 0.3809, 3.2322, 0.14171, {-3: 2.0, -2: 2.4, 0: 3.2, 2: 4.2, 3: 4.8}),
+    ("length-for-age, boys, birth", 1.0, 49.8842, 0.03795, {-3: 44.2, -2: 46.1, 0: 49.9, 2: 53.7, 3: 55.6}),
+]
+# The curves are printed to 0.1, so a correct one is within half of that
+SPOT_CHECK_TOLERANCE = 0.05
+
+
+def _sd_curve(l, m, s, k):
+    return m * (1 + l * s * k) ** (1 / l)
+
+
+def spot_check():
+    # Returns a list of failures; empty when the LMS math reproduces the published curves
+    failures = []
+    for label, l, m, s, curves in SPOT_CHECKS:
+        for k, printed in curves.items():
+            value = _sd_curve(l, m, s, k)
+            if abs(value - printed) > SPOT_CHECK_TOLERANCE:
+                failures.append(f"{label}: {k:+d} SD curve is {value:.3f}, published {printed}")
+            z = float(lms_zscore(value, l, m, s))
+            if abs(z - k) > 1e-9:
+                failures.append(f"{label}: the {k:+d} SD value {value:.3f} gave z {z:.6f}")
+        # Restricted extrapolation: one 2-3 SD interval beyond +3 SD is exactly +4
+        sd2, sd3 = _sd_curve(l, m, s, 2), _sd_curve(l, m, s, 3)
+        z = float(lms_zscore(sd3 + (sd3 - sd2), l, m, s, restricted=True))
+        if abs(z - 4) > 1e-9:
+            failures.append(f"{label}: restricted z beyond +3 SD was {z:.6f}, expected 4")
+    categories = list(classify_whz([-3.0, -2.0, 2.0, 2.01]))
+    if categories != ["Moderate Wasting", "Normal", "Normal", "Overweight"]:
+        failures.append(f"classify_whz boundaries: {categories}")
+    return failures
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["check"]:
+        sys.exit("usage: python zscore.py check")
+    problems = spot_check()
+    for problem in problems:
+        print(problem)
+    print("ok" if not problems else f"{len(problems)} spot check(s) failed")
+    sys.exit(1 if problems else 0)